@@ -0,0 +1,1485 @@
+'''
+K-means phân cụm từ đầu (tách từ notebook KMeans_BT05.ipynb để import được).
+
+Gồm chuẩn hóa Z-score (cả dạng theo luồng), các cách khởi tạo K-means++,
+KMeansScratch (Lloyd / Hamerly), mini-batch và online K-means, các chỉ số chất
+lượng phân cụm và kmeans_sweep chạy song song nhiều (K, seed).
+
+Module chỉ import numpy khi nạp; pandas (đọc CSV), matplotlib (vẽ hình) và
+concurrent.futures / multiprocessing (sweep song song) chỉ được import khi dùng
+tới. Ngân sách thời gian import: IMPORT_BUDGET_MS (không tính numpy), kiểm tra bằng
+--check-import-time.
+
+Ví dụ:
+    python KMeans_BT05.py khu_vuc.csv --columns Luu_luong Dien_tich --k 3
+    python KMeans_BT05.py X.npy --k 2 3 4 5 6 --init k-means++ --output labels.npy
+    python KMeans_BT05.py --check-import-time
+'''
+from __future__ import annotations
+
+import copy
+import os
+import sys
+import time
+
+import numpy as np
+
+# Thời gian import tối đa của riêng module (ms, không tính numpy) trong một process mới,
+# kể cả khi chưa có bytecode cache (__pycache__) và phải biên dịch lại file .py
+IMPORT_BUDGET_MS = 30.0
+# Các thư viện nặng không được nạp khi chỉ import module
+LAZY_MODULES = ("pandas", "matplotlib", "concurrent.futures", "multiprocessing")
+
+
+# ============================================================
+# Chuẩn hóa dữ liệu (Z-score)
+# ============================================================
+def _float_dtype(X):
+    """dtype dùng để tính toán: giữ nguyên float32/float64 của X, kiểu nguyên -> float64"""
+    return X.dtype if np.issubdtype(X.dtype, np.floating) else np.dtype(np.float64)
+
+
+def zscore_fit_transform(X: np.ndarray):
+    """
+    Chuẩn hóa Z-score: X_std = (X - mean) / std
+    Giữ nguyên dtype của X (float32 / float64, kể cả np.memmap); mean và std được
+    tích lũy bằng float64 để không mất độ chính xác với float32.
+    Args:
+        X: mảng dữ liệu cần chuẩn hóa (n_samples, n_features)
+    Returns:
+        X_std: dữ liệu đã chuẩn hóa (cùng dtype với X)
+        mean: giá trị trung bình của mỗi feature (float64)
+        std: độ lệch chuẩn của mỗi feature (float64)
+    """
+    mean = X.mean(axis=0, dtype=np.float64)
+    std = X.std(axis=0, ddof=0, dtype=np.float64)  # ddof=0 để tính population std
+    # Tránh chia cho 0 nếu có cột hằng số
+    std = np.where(std == 0, 1.0, std)
+    dtype = _float_dtype(X)
+    # Một mảng kết quả duy nhất, các phép còn lại thực hiện tại chỗ
+    X_std = np.subtract(X, mean.astype(dtype), dtype=dtype)
+    X_std /= std.astype(dtype)
+    return X_std, mean, std
+
+
+def zscore_inverse_transform(X_std: np.ndarray, mean: np.ndarray, std: np.ndarray):
+    """
+    Giải chuẩn hóa Z-score để quay về đơn vị gốc.
+    Args:
+        X_std: dữ liệu đã chuẩn hóa
+        mean: giá trị trung bình đã lưu từ quá trình chuẩn hóa
+        std: độ lệch chuẩn đã lưu từ quá trình chuẩn hóa
+    Returns:
+        X: dữ liệu ở đơn vị gốc (cùng dtype với X_std)
+    """
+    dtype = _float_dtype(X_std)
+    X = np.multiply(X_std, np.asarray(std, dtype=dtype), dtype=dtype)
+    X += np.asarray(mean, dtype=dtype)
+    return X
+
+
+class StreamingZScoreScaler:
+    """
+    Chuẩn hóa Z-score tăng dần: partial_fit theo từng khối, gộp thống kê bằng công thức Chan.
+    Thống kê luôn được tích lũy bằng float64; std là độ lệch chuẩn tổng thể (ddof=0).
+    """
+
+    def __init__(self):
+        self.n_samples_seen_ = 0
+        self.mean_ = None
+        self._m2 = None
+
+    def _merge_stats(self, n_b, mean_b, m2_b):
+        if n_b == 0:
+            return
+        if self.n_samples_seen_ == 0:
+            self.n_samples_seen_, self.mean_, self._m2 = n_b, mean_b, m2_b
+            return
+        n_a = self.n_samples_seen_
+        n = n_a + n_b
+        delta = mean_b - self.mean_
+        self.mean_ = self.mean_ + delta * (n_b / n)
+        self._m2 = self._m2 + m2_b + delta ** 2 * (n_a * n_b / n)
+        self.n_samples_seen_ = n
+
+    def partial_fit(self, X_chunk):
+        """
+        Cập nhật mean/std với một khối dữ liệu
+        Args:
+            X_chunk: khối dữ liệu (n_chunk, n_features)
+        Returns:
+            self
+        """
+        X_chunk = np.asarray(X_chunk)
+        n_b = X_chunk.shape[0]
+        if n_b == 0:
+            return self
+        mean_b = X_chunk.mean(axis=0, dtype=np.float64)
+        m2_b = ((X_chunk - mean_b) ** 2).sum(axis=0, dtype=np.float64)
+        self._merge_stats(n_b, mean_b, m2_b)
+        return self
+
+    def merge(self, other):
+        """
+        Gộp thống kê của một scaler khác (ví dụ tính trên khối khác ở process khác)
+        Returns:
+            self
+        """
+        if other.n_samples_seen_:
+            self._merge_stats(other.n_samples_seen_, other.mean_.copy(), other._m2.copy())
+        return self
+
+    @property
+    def var_(self):
+        return self._m2 / self.n_samples_seen_
+
+    @property
+    def std_(self):
+        std = np.sqrt(self.var_)
+        # Tránh chia cho 0 nếu có cột hằng số
+        return np.where(std == 0, 1.0, std)
+
+    def _params_for(self, X):
+        if self.mean_ is None:
+            raise RuntimeError("Scaler chưa được fit")
+        dtype = _float_dtype(X)
+        return self.mean_.astype(dtype, copy=False), self.std_.astype(dtype, copy=False)
+
+    def _output(self, X, copy):
+        X = np.asarray(X)
+        if copy or not np.issubdtype(X.dtype, np.floating):
+            return np.array(X, dtype=_float_dtype(X))
+        if not X.flags.writeable:
+            raise ValueError("copy=False cần mảng ghi được")
+        return X
+
+    def transform(self, X, copy=True):
+        """
+        X_std = (X - mean) / std, giữ nguyên dtype float32/float64
+        Args:
+            X: dữ liệu (n_samples, n_features)
+            copy: False = sửa trực tiếp trên X (không tạo bản sao)
+        """
+        out = self._output(X, copy)
+        mean, std = self._params_for(out)
+        out -= mean
+        out /= std
+        return out
+
+    def inverse_transform(self, X_std, copy=True):
+        """X = X_std * std + mean (giải chuẩn hóa), copy=False sửa trực tiếp trên X_std"""
+        out = self._output(X_std, copy)
+        mean, std = self._params_for(out)
+        out *= std
+        out += mean
+        return out
+
+    def fit_csv(self, path, columns, chunksize=1_000_000):
+        """
+        partial_fit lần lượt từng khối của một file CSV lớn (chỉ đọc các cột cần dùng)
+        Returns:
+            self
+        """
+        import pandas as pd
+
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize):
+            self.partial_fit(chunk[columns].to_numpy())
+        return self
+
+
+# ============================================================
+# Khởi tạo tâm cụm: K-means++, K-means++ tham lam, K-means||
+# ============================================================
+def _sq_dists(X: np.ndarray, C: np.ndarray, chunk_size: int = 4096):
+    """
+    Khoảng cách bình phương từ mỗi điểm X đến mỗi tâm C (n_samples, n_centers)
+    Dùng đẳng thức ||x - c||² = ||x||² - 2x·c + ||c||² theo từng khối chunk_size dòng
+    """
+    c_sq = np.einsum("ij,ij->i", C, C)
+    out = np.empty((X.shape[0], C.shape[0]), dtype=np.result_type(X, C))
+    for start in range(0, X.shape[0], chunk_size):
+        Xb = X[start:start + chunk_size]
+        block = out[start:start + chunk_size]
+        np.dot(Xb, C.T, out=block)
+        block *= -2.0
+        block += np.einsum("ij,ij->i", Xb, Xb)[:, None]
+        block += c_sq
+    # Sai số làm tròn có thể cho giá trị âm rất nhỏ
+    return np.maximum(out, 0.0, out=out)
+
+
+def _sample_d2(cum: np.ndarray, rng: np.random.Generator, size=None):
+    """Chọn chỉ số với xác suất tỉ lệ thuận với trọng số (cum là tổng tích lũy trọng số)"""
+    r = rng.random(size) * cum[-1]
+    return np.minimum(np.searchsorted(cum, r, side="right"), len(cum) - 1)
+
+
+def kmeans_pp_init(X: np.ndarray, k: int, rng: np.random.Generator, sample_weight=None):
+    """
+    Khởi tạo tâm cụm theo thuật toán K-means++
+    Args:
+        X: dữ liệu (n_samples, n_features)
+        k: số lượng clusters
+        rng: random number generator
+        sample_weight: trọng số của từng điểm (None = như nhau)
+    Returns:
+        centroids: k centroids ban đầu (k, n_features), cùng dtype với X
+    """
+    n = X.shape[0]
+    # Trọng số float64 -> tổng tích lũy D² luôn tính bằng float64 kể cả khi X là float32
+    w = np.ones(n) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+    centroids = np.empty((k, X.shape[1]), dtype=_float_dtype(X))
+    # Chọn centroid đầu tiên ngẫu nhiên (theo trọng số)
+    idx0 = _sample_d2(np.cumsum(w), rng)
+    centroids[0] = X[idx0]
+    # Tính khoảng cách bình phương đến centroid đầu tiên
+    dist2 = np.sum((X - centroids[0]) ** 2, axis=1)
+    # Chọn các centroid tiếp theo
+    for c in range(1, k):
+        # Trường hợp đặc biệt: tất cả điểm trùng nhau
+        if np.all(dist2 == 0):
+            idx = rng.integers(0, n)
+            centroids[c] = X[idx]
+            continue
+        # Chọn điểm mới với xác suất tỉ lệ với D²: một lần cumsum + tìm nhị phân,
+        # không dựng lại phân phối như rng.choice(n, p=probs)
+        idx = _sample_d2(np.cumsum(w * dist2), rng)
+        centroids[c] = X[idx]
+        # Cập nhật khoảng cách: D² = min(D² hiện tại, D² đến centroid mới)
+        new_dist2 = np.sum((X - centroids[c]) ** 2, axis=1)
+        dist2 = np.minimum(dist2, new_dist2)
+    return centroids
+
+
+def kmeans_pp_greedy_init(X: np.ndarray, k: int, rng: np.random.Generator, sample_weight=None,
+                          n_local_trials=None):
+    """
+    K-means++ "tham lam": mỗi bước lấy n_local_trials ứng viên theo D² và giữ ứng viên
+    làm giảm tổng D² (potential) nhiều nhất
+    Args:
+        X: dữ liệu (n_samples, n_features)
+        k: số lượng clusters
+        rng: random number generator
+        sample_weight: trọng số của từng điểm (None = như nhau)
+        n_local_trials: số ứng viên mỗi bước (None = 2 + log(k))
+    Returns:
+        centroids: k centroids ban đầu (k, n_features)
+    """
+    n = X.shape[0]
+    w = np.ones(n) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+    if n_local_trials is None:
+        n_local_trials = 2 + int(np.log(k))
+    centroids = np.empty((k, X.shape[1]), dtype=_float_dtype(X))
+    centroids[0] = X[_sample_d2(np.cumsum(w), rng)]
+    closest = _sq_dists(X, centroids[:1])[:, 0]
+    for c in range(1, k):
+        if not np.any(closest > 0):
+            centroids[c] = X[rng.integers(0, n)]
+            continue
+        cand = _sample_d2(np.cumsum(w * closest), rng, n_local_trials)
+        # D² mới nếu thêm từng ứng viên (n_samples, n_local_trials)
+        new_closest = np.minimum(closest[:, None], _sq_dists(X, X[cand]))
+        best = int(np.argmin(w @ new_closest))
+        centroids[c] = X[cand[best]]
+        closest = new_closest[:, best]
+    return centroids
+
+
+def kmeans_parallel_init(X: np.ndarray, k: int, rng: np.random.Generator, oversampling=None,
+                         n_rounds=None):
+    """
+    Khởi tạo K-means|| (Bahmani et al., 2012)
+    Thay vì k lượt tuần tự, mỗi vòng chọn độc lập từng điểm với xác suất l·D²/φ
+    (thao tác vector trên toàn bộ dữ liệu, dễ song song hóa), chỉ cần O(log n) vòng.
+    Các ứng viên được đánh trọng số bằng số điểm gần nó nhất rồi rút gọn về k tâm
+    bằng K-means++ tham lam có trọng số.
+    Args:
+        X: dữ liệu (n_samples, n_features)
+        k: số lượng clusters
+        rng: random number generator
+        oversampling: l = số ứng viên kỳ vọng mỗi vòng (None = 2k)
+        n_rounds: số vòng (None = log(n), tối đa 8)
+    Returns:
+        centroids: k centroids ban đầu (k, n_features)
+    """
+    n = X.shape[0]
+    l = 2 * k if oversampling is None else oversampling
+    if n_rounds is None:
+        n_rounds = max(1, min(8, int(np.ceil(np.log(n)))))
+    chosen = np.zeros(n, dtype=bool)
+    first = rng.integers(0, n)
+    chosen[first] = True
+    closest = np.sum((X - X[first]) ** 2, axis=1)
+    for _ in range(n_rounds):
+        phi = closest.sum()
+        if phi == 0:
+            break
+        new = np.nonzero(rng.random(n) < l * closest / phi)[0]
+        if new.size == 0:
+            continue
+        chosen[new] = True
+        closest = np.minimum(closest, _sq_dists(X, X[new]).min(axis=1))
+    cand = np.nonzero(chosen)[0]
+    if cand.size < k:
+        # Quá ít ứng viên (dữ liệu nhỏ hoặc nhiều điểm trùng) -> bổ sung ngẫu nhiên
+        extra = rng.choice(np.nonzero(~chosen)[0], k - cand.size, replace=False)
+        cand = np.concatenate([cand, extra])
+    # Trọng số ứng viên = số điểm dữ liệu nhận nó làm ứng viên gần nhất
+    nearest = np.concatenate([
+        np.argmin(_sq_dists(X[start:start + 4096], X[cand]), axis=1)
+        for start in range(0, n, 4096)
+    ])
+    weights = np.bincount(nearest, minlength=cand.size).astype(float)
+    return kmeans_pp_greedy_init(X[cand], k, rng, sample_weight=weights)
+
+
+# ============================================================
+# Theo dõi quá trình fit (callbacks)
+# ============================================================
+class FitRecorder:
+    """
+    Callback cho KMeansScratch(callbacks=[...]): lưu thông số từng vòng lặp và xuất ra JSON/CSV.
+    Mỗi callback là một hàm callback(model, record) được gọi sau mỗi vòng lặp của fit.
+    """
+    FIELDS = ("k", "seed", "iteration", "assign_s", "update_s", "inertia_s", "n_label_changes",
+              "centroid_shift", "inertia", "n_distance_evals")
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, model, record):
+        self.records.append(record)
+
+    def totals(self):
+        """Tổng thời gian (giây) của từng bước assign / update / inertia trên mọi vòng lặp"""
+        return {key: sum(r[key] for r in self.records) for key in ("assign_s", "update_s", "inertia_s")}
+
+    def to_json(self, path):
+        import json
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.records, f, indent=2)
+
+    def to_csv(self, path):
+        import csv
+
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+            writer.writeheader()
+            writer.writerows(self.records)
+
+
+# ============================================================
+# Thuật toán K-means từ đầu (Lloyd / Hamerly)
+# ============================================================
+class KMeansScratch:
+    """
+    Thuật toán K-means clustering from scratch theo procedure chuẩn 5 bước.
+
+    Procedure:
+    - STEP 1: Initialize the value of K
+    - STEP 2: Select random K centroids
+    - STEP 3: Assign each data point to a cluster
+    - STEP 4: Calculate a new centroid of each cluster
+    - STEP 5: Repeat step 3 and 4 until convergent then stop
+    """
+    INIT_METHODS = ("random", "k-means++", "greedy-k-means++", "k-means||")
+
+    def __init__(self, k, max_iters=100, tol=1e-8, random_state=42, verbose=True, chunk_size=4096,
+                 algorithm="lloyd", init="random", n_init=1, callbacks=None):
+        """
+        Args:
+            k: số lượng clusters (STEP 1)
+            max_iters: số vòng lặp tối đa
+            tol: ngưỡng hội tụ
+            random_state: seed cho random
+            verbose: hiển thị chi tiết từng bước
+            chunk_size: số điểm mỗi khối khi tính khoảng cách (giới hạn bộ nhớ n×k)
+            algorithm: "lloyd" (tính mọi khoảng cách) hoặc "hamerly" (bỏ qua phần lớn
+                       phép tính khoảng cách nhờ bất đẳng thức tam giác, kết quả như lloyd)
+            init: cách chọn K tâm ban đầu (STEP 2): "random", "k-means++",
+                  "greedy-k-means++", "k-means||" hoặc mảng (k, n_features)
+            n_init: số lần chạy với seed random_state, random_state+1, ...; giữ kết quả
+                    có inertia nhỏ nhất
+            callbacks: danh sách hàm callback(model, record) gọi sau mỗi vòng lặp, record
+                       gồm thời gian assign/update/inertia, số nhãn thay đổi, độ dịch chuyển
+                       centroid lớn nhất (xem FitRecorder). None = không thu thập gì thêm
+        """
+        if algorithm not in ("lloyd", "hamerly"):
+            raise ValueError(f"algorithm phải là 'lloyd' hoặc 'hamerly', nhận '{algorithm}'")
+        if isinstance(init, str) and init not in self.INIT_METHODS:
+            raise ValueError(f"init phải là một trong {self.INIT_METHODS} hoặc mảng, nhận '{init}'")
+        self.k = k
+        self.max_iters = max_iters
+        self.tol = tol
+        self.random_state = random_state
+        self.verbose = verbose
+        self.chunk_size = chunk_size
+        self.algorithm = algorithm
+        self.init = init
+        self.n_init = n_init
+        self.callbacks = callbacks
+        self.best_seed_ = None
+        self.centroids = None
+        self.labels = None
+        self.inertia_ = None
+        self.n_iters_ = None
+        # Số phép tính khoảng cách điểm-tâm thực hiện / bỏ qua ở mỗi vòng lặp
+        self.n_distance_evals_ = []
+        self.n_distance_skipped_ = []
+
+    def _init_centroids(self, X):
+        """
+        STEP 2: Select K centroids theo self.init
+        Returns:
+            (centroids, init_idx): init_idx là chỉ số các điểm được chọn (chỉ với "random")
+        """
+        if not isinstance(self.init, str):
+            centroids = np.array(self.init, dtype=_float_dtype(X))
+            if centroids.shape != (self.k, X.shape[1]):
+                raise ValueError(f"init có kích thước {centroids.shape}, cần {(self.k, X.shape[1])}")
+            return centroids, None
+        if self.init == "random":
+            np.random.seed(self.random_state)
+            init_idx = np.random.choice(X.shape[0], self.k, replace=False)
+            return X[init_idx].copy(), init_idx
+        rng = np.random.default_rng(self.random_state)
+        if self.init == "k-means++":
+            return kmeans_pp_init(X, self.k, rng), None
+        if self.init == "greedy-k-means++":
+            return kmeans_pp_greedy_init(X, self.k, rng), None
+        return kmeans_parallel_init(X, self.k, rng), None
+
+    def _assign_labels(self, X, x_sq=None):
+        """
+        STEP 3: Assign each data point to a cluster
+        Tính khoảng cách và gán mỗi điểm vào cluster gần nhất
+
+        Dùng đẳng thức ||x - c||² = ||x||² - 2x·c + ||c||² theo từng khối chunk_size
+        dòng với buffer cấp phát sẵn, không tạo mảng trung gian n×k×d.
+        Args:
+            X: dữ liệu (n_samples, n_features)
+            x_sq: ||x||² của từng điểm (tính sẵn trong fit để dùng lại mỗi vòng lặp)
+        """
+        rtol = self._rtol(X)
+        n = X.shape[0]
+        if x_sq is None:
+            x_sq = np.einsum("ij,ij->i", X, X)
+        c_sq = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        chunk = max(1, min(self.chunk_size, n))
+        dist2 = np.empty((chunk, self.k), dtype=np.result_type(X, self.centroids))
+        labels = np.empty(n, dtype=np.intp)
+        for start in range(0, n, chunk):
+            stop = min(start + chunk, n)
+            buf = dist2[:stop - start]
+            # buf = -2 x·c + ||c||² (||x||² không ảnh hưởng argmin, chỉ dùng cho sai số)
+            np.dot(X[start:stop], self.centroids.T, out=buf)
+            buf *= -2.0
+            buf += c_sq
+            labels[start:stop] = np.argmin(buf, axis=1)
+            if self.k > 1:
+                # Điểm gần như cách đều 2 tâm: sai số làm tròn có thể đổi kết quả argmin
+                # -> tính lại chính xác bằng hiệu trực tiếp cho riêng các điểm này
+                two = np.partition(buf, 1, axis=1)[:, :2]
+                margin = rtol * (x_sq[start:stop] + c_sq.max())
+                close = np.nonzero(two[:, 1] - two[:, 0] <= margin)[0]
+                if close.size:
+                    diff = X[start + close][:, None, :] - self.centroids[None, :, :]
+                    labels[start + close] = np.argmin(np.sum(diff ** 2, axis=2), axis=1)
+        return labels
+
+    @staticmethod
+    def _rtol(X):
+        """Sai số tương đối cho phép khi so sánh khoảng cách (float32 kém chính xác hơn float64)"""
+        return max(1e-9, 1000 * np.finfo(_float_dtype(X)).eps)
+
+    def _exact_dist(self, X_rows):
+        """Khoảng cách Euclidean chính xác (tính hiệu trực tiếp) từ các điểm đến mọi centroid"""
+        n, d = X_rows.shape
+        out = np.empty((n, self.k))
+        block = max(1, (64 * self.chunk_size) // (self.k * d))
+        for start in range(0, n, block):
+            diff = X_rows[start:start + block][:, None, :] - self.centroids[None, :, :]
+            out[start:start + block] = np.sum(diff ** 2, axis=2)
+        return np.sqrt(out, out=out)
+
+    def _assign_labels_hamerly(self, X):
+        """
+        STEP 3 (Hamerly): gán nhãn với cận trên/cận dưới khoảng cách
+
+        Mỗi điểm giữ u = cận trên khoảng cách tới tâm của nó, l = cận dưới khoảng cách
+        tới tâm gần thứ hai. Sau khi tâm dịch chuyển p_j: u += p[label], l -= max p.
+        Gọi s_j = nửa khoảng cách từ tâm j tới tâm gần nhất khác. Nếu u < max(s_label, l)
+        thì nhãn chắc chắn không đổi (bất đẳng thức tam giác) -> bỏ qua k phép tính.
+        """
+        n = X.shape[0]
+        if getattr(self, "_upper", None) is None:
+            # Vòng lặp đầu tiên: tính toàn bộ n×k khoảng cách
+            dist = self._exact_dist(X)
+            labels = np.argmin(dist, axis=1)
+            self._upper = dist[np.arange(n), labels]
+            dist[np.arange(n), labels] = np.inf
+            self._lower = dist.min(axis=1) if self.k > 1 else np.full(n, np.inf)
+            self._prev_centroids = self.centroids.copy()
+            self.n_distance_evals_.append(n * self.k)
+            self.n_distance_skipped_.append(0)
+            return labels
+
+        labels = self.labels.copy()
+        shift = np.sqrt(np.sum((self.centroids - self._prev_centroids) ** 2, axis=1))
+        self._upper += shift[labels]
+        if self.k > 1:
+            top = np.argsort(shift)[::-1][:2]
+            self._lower -= np.where(labels == top[0], shift[top[1]], shift[top[0]])
+            cc = np.sqrt(np.sum((self.centroids[:, None, :] - self.centroids[None, :, :]) ** 2, axis=2))
+            np.fill_diagonal(cc, np.inf)
+            half_gap = 0.5 * cc.min(axis=1)
+        else:
+            half_gap = np.full(1, np.inf)
+
+        bound = np.maximum(half_gap[labels], self._lower)
+        # Sai số làm tròn của các cận -> nới lỏng một chút để kết quả luôn trùng với lloyd
+        slack = self._rtol(X) * (1.0 + self._upper)
+        cand = np.nonzero(self._upper + slack >= bound)[0]
+        evals = cand.size
+        if cand.size:
+            # Làm chặt cận trên bằng khoảng cách thật tới tâm hiện tại
+            diff = X[cand] - self.centroids[labels[cand]]
+            self._upper[cand] = np.sqrt(np.sum(diff ** 2, axis=1))
+            cand = cand[self._upper[cand] + slack[cand] >= bound[cand]]
+        if cand.size:
+            # Vẫn không loại trừ được -> tính khoảng cách tới mọi tâm
+            dist = self._exact_dist(X[cand])
+            evals += cand.size * self.k
+            new = np.argmin(dist, axis=1)
+            rows = np.arange(cand.size)
+            labels[cand] = new
+            self._upper[cand] = dist[rows, new]
+            dist[rows, new] = np.inf
+            self._lower[cand] = dist.min(axis=1)
+
+        self._prev_centroids = self.centroids.copy()
+        self.n_distance_evals_.append(int(evals))
+        self.n_distance_skipped_.append(int(n * self.k - evals))
+        return labels
+
+    def _update_centroids(self, X):
+        """
+        STEP 4: Calculate a new centroid of each cluster
+        Cập nhật centroid = trung bình các điểm trong cluster
+
+        Một lượt duyệt dữ liệu: bincount tính số điểm và tổng tọa độ của mọi cluster
+        cùng lúc (O(n·d)), thay vì lọc X[labels == j] cho từng cluster (O(n·k·d)).
+        Tổng tọa độ tích lũy bằng float64, centroids trả về giữ dtype của X.
+        """
+        counts = np.bincount(self.labels, minlength=self.k)
+        new_centroids = np.empty(self.centroids.shape)
+        for f in range(X.shape[1]):
+            new_centroids[:, f] = np.bincount(self.labels, weights=X[:, f], minlength=self.k)
+        nonempty = counts > 0
+        # Centroid = trung bình tọa độ các điểm trong cluster
+        new_centroids[nonempty] /= counts[nonempty, None]
+        empty = np.nonzero(~nonempty)[0]
+        if empty.size:
+            rng = np.random.default_rng(self.random_state)
+            for j in empty:
+                # Xử lý cụm rỗng: chọn ngẫu nhiên 1 điểm làm centroid mới
+                new_centroids[j] = X[rng.integers(0, X.shape[0])]
+        return new_centroids.astype(self.centroids.dtype, copy=False)
+
+    def _compute_inertia(self, X):
+        """
+        Tính Inertia (SSE): tổng bình phương khoảng cách từ điểm đến centroid
+        Tính theo từng khối chunk_size dòng, tích lũy bằng float64 (kể cả khi X là float32)
+        """
+        total = 0.0
+        for start in range(0, X.shape[0], self.chunk_size):
+            diff = X[start:start + self.chunk_size] - self.centroids[self.labels[start:start + self.chunk_size]]
+            total += float(np.sum(diff * diff, dtype=np.float64))
+        return total
+
+    def _fit_multi(self, X):
+        """Multiple Runs: chạy n_init lần với các seed khác nhau, giữ lần có inertia nhỏ nhất"""
+        best = None
+        for i in range(self.n_init):
+            run = copy.copy(self)
+            run.n_init, run.verbose = 1, False
+            run.random_state = self.random_state + i
+            run.fit(X)
+            if self.verbose:
+                print(f"Lần chạy {i + 1}/{self.n_init} (seed={run.random_state}): "
+                      f"inertia = {run.inertia_:.6f}, {run.n_iters_} iterations")
+            if best is None or run.inertia_ < best.inertia_:
+                best = run
+        for attr in ("centroids", "labels", "inertia_", "n_iters_", "best_seed_",
+                     "n_distance_evals_", "n_distance_skipped_"):
+            setattr(self, attr, getattr(best, attr))
+        return self
+
+    def fit(self, X):
+        """
+        Fit K-means theo procedure chuẩn 5 bước
+        Args:
+            X: dữ liệu (n_samples, n_features); float32/float64 hoặc np.memmap được dùng
+               trực tiếp, không chuyển kiểu hay sao chép (centroids cùng dtype với X)
+        Returns:
+            self
+        """
+        n = X.shape[0]
+        # Validation
+        if self.k < 1:
+            raise ValueError("k phải >= 1")
+        if self.k > n:
+            raise ValueError(f"k={self.k} > số điểm n={n}. Không hợp lệ.")
+        if self.n_init > 1:
+            return self._fit_multi(X)
+        self.best_seed_ = self.random_state
+        # STEP 1: Initialize the value of K (đã có self.k)
+        if self.verbose:
+            print("="*70)
+            print(f"STEP 1: Initialize K = {self.k}")
+            print("="*70)
+        # STEP 2: Select random K centroids
+        self.centroids, init_idx = self._init_centroids(X)
+        if self.verbose:
+            print(f"STEP 2: Select {self.k} centroids (init = {self.init if isinstance(self.init, str) else 'array'})")
+            if init_idx is not None:
+                print(f"  → Chọn các điểm có index: {init_idx.tolist()}")
+            print(f"  → Centroids ban đầu (normalized):")
+            for j, c in enumerate(self.centroids):
+                print(f"      Cluster {j}: {c}")
+            print("="*70)
+        # ||x||² không đổi giữa các vòng lặp -> tính một lần
+        x_sq = np.einsum("ij,ij->i", X, X)
+        self._upper = None
+        self.n_distance_evals_, self.n_distance_skipped_ = [], []
+        prev_labels = None
+        # STEP 5: Repeat STEP 3 and STEP 4 until convergent
+        for it in range(1, self.max_iters + 1):
+            old_centroids = self.centroids.copy()
+            t_start = time.perf_counter()
+            # STEP 3: Assign each data point to a cluster
+            if self.algorithm == "hamerly":
+                self.labels = self._assign_labels_hamerly(X)
+            else:
+                self.labels = self._assign_labels(X, x_sq)
+            t_assign = time.perf_counter()
+            # STEP 4: Calculate a new centroid of each cluster
+            self.centroids = self._update_centroids(X)
+            t_update = time.perf_counter()
+            # Tính inertia
+            self.inertia_ = self._compute_inertia(X)
+            if self.callbacks:
+                # Chỉ tính các số liệu phụ (O(n) + O(k·d)) khi có callback
+                changes = n if prev_labels is None else int(np.count_nonzero(prev_labels != self.labels))
+                shift = np.sqrt(np.max(np.sum((self.centroids - old_centroids) ** 2, axis=1)))
+                record = {
+                    "k": self.k,
+                    "seed": self.random_state,
+                    "iteration": it,
+                    "assign_s": t_assign - t_start,
+                    "update_s": t_update - t_assign,
+                    "inertia_s": time.perf_counter() - t_update,
+                    "n_label_changes": changes,
+                    "centroid_shift": float(shift),
+                    "inertia": self.inertia_,
+                    "n_distance_evals": self.n_distance_evals_[-1] if self.algorithm == "hamerly" else n * self.k,
+                }
+                for callback in self.callbacks:
+                    callback(self, record)
+            prev_labels = self.labels
+            if self.verbose:
+                print(f"\n--- Iteration {it} ---")
+                if n <= 50:
+                    print(f"STEP 3 (Assignment): labels = {self.labels.tolist()}")
+                else:
+                    # In toàn bộ nhãn rất tốn thời gian với n lớn -> chỉ in số điểm mỗi cụm
+                    print(f"STEP 3 (Assignment): số điểm mỗi cluster = "
+                          f"{np.bincount(self.labels, minlength=self.k).tolist()}")
+                print(f"STEP 4 (Update): centroids (normalized):")
+                for j, c in enumerate(self.centroids):
+                    print(f"  Cluster {j}: {c}")
+                print(f"Inertia (SSE normalized): {self.inertia_:.6f}")
+                if self.algorithm == "hamerly":
+                    print(f"Khoảng cách đã tính: {self.n_distance_evals_[-1]}, "
+                          f"bỏ qua: {self.n_distance_skipped_[-1]}")
+            # STEP 5: Check convergence (điều kiện dừng)
+            if np.allclose(old_centroids, self.centroids, atol=self.tol):
+                self.n_iters_ = it
+                if self.verbose:
+                    print(f"\n✓ HỘI TỤ sau {it} iterations!")
+                    print("="*70)
+                break
+        else:
+            self.n_iters_ = self.max_iters
+            if self.verbose:
+                print(f"\n⚠ Đạt max_iters={self.max_iters} mà chưa hội tụ!")
+        return self
+
+
+# ============================================================
+# Chỉ số chất lượng phân cụm
+# ============================================================
+def _cluster_centers(X, labels, k):
+    """Tâm (trung bình) mỗi cụm tính bằng bincount, tích lũy float64"""
+    counts = np.bincount(labels, minlength=k)
+    centers = np.zeros((k, X.shape[1]))
+    for f in range(X.shape[1]):
+        centers[:, f] = np.bincount(labels, weights=X[:, f], minlength=k)
+    nonempty = counts > 0
+    centers[nonempty] /= counts[nonempty, None]
+    return centers
+
+
+def _within_cluster_sums(X, labels, centroids, chunk_size=4096):
+    """
+    Một lượt duyệt X theo khối: tổng khoảng cách và tổng bình phương khoảng cách tới tâm, theo cụm
+    Returns:
+        (dist_sum, sq_sum): mảng (k,) float64
+    """
+    k = centroids.shape[0]
+    dist_sum, sq_sum = np.zeros(k), np.zeros(k)
+    for start in range(0, X.shape[0], chunk_size):
+        lab = labels[start:start + chunk_size]
+        diff = X[start:start + chunk_size] - centroids[lab]
+        sq = np.einsum("ij,ij->i", diff, diff).astype(np.float64)
+        sq_sum += np.bincount(lab, weights=sq, minlength=k)
+        dist_sum += np.bincount(lab, weights=np.sqrt(sq), minlength=k)
+    return dist_sum, sq_sum
+
+
+def silhouette_score_chunked(X, labels, sample_size=None, random_state=0, chunk_size=1024):
+    """
+    Hệ số Silhouette trung bình, tính theo khối chunk_size dòng (bộ nhớ O(chunk_size × n))
+    Args:
+        X: dữ liệu (n_samples, n_features)
+        labels: nhãn cụm của từng điểm
+        sample_size: nếu n > sample_size thì xấp xỉ trên sample_size điểm ngẫu nhiên (None = chính xác)
+        random_state: seed khi lấy mẫu
+        chunk_size: số dòng mỗi khối ma trận khoảng cách
+    Returns:
+        silhouette trung bình (NaN nếu số cụm < 2 hoặc = số điểm)
+    """
+    labels = np.asarray(labels)
+    if sample_size is not None and X.shape[0] > sample_size:
+        idx = np.sort(np.random.default_rng(random_state).choice(X.shape[0], sample_size, replace=False))
+        X, labels = X[idx], labels[idx]
+    n = X.shape[0]
+    # Đánh lại số thứ tự cụm 0..k-1 (bỏ cụm rỗng)
+    _, labels = np.unique(labels, return_inverse=True)
+    k = int(labels.max()) + 1
+    if k < 2 or k >= n:
+        return float("nan")
+    counts = np.bincount(labels, minlength=k)
+    onehot = np.zeros((n, k), dtype=_float_dtype(X))
+    onehot[np.arange(n), labels] = 1.0
+    total = 0.0
+    for start in range(0, n, chunk_size):
+        lab = labels[start:start + chunk_size]
+        rows = np.arange(lab.size)
+        # Tổng khoảng cách từ mỗi điểm trong khối tới từng cụm (chunk, k)
+        D = np.sqrt(_sq_dists(X[start:start + chunk_size], X, chunk_size))
+        sums = (D @ onehot).astype(np.float64)
+        own = counts[lab]
+        a = sums[rows, lab] / np.maximum(own - 1, 1)
+        sums /= counts
+        sums[rows, lab] = np.inf
+        b = sums.min(axis=1)
+        s = (b - a) / np.maximum(np.maximum(a, b), np.finfo(np.float64).tiny)
+        # Quy ước: điểm là phần tử duy nhất của cụm có s = 0
+        total += float(np.sum(np.where(own > 1, s, 0.0)))
+    return total / n
+
+
+def davies_bouldin_score_chunked(X, labels, centroids=None, chunk_size=4096):
+    """
+    Chỉ số Davies–Bouldin (càng nhỏ càng tốt)
+    Args:
+        X: dữ liệu (n_samples, n_features)
+        labels: nhãn cụm của từng điểm
+        centroids: tâm cụm (k, n_features), None = tính trung bình theo labels
+        chunk_size: số dòng mỗi khối
+    Returns:
+        Davies–Bouldin (NaN nếu số cụm khác rỗng < 2)
+    """
+    labels = np.asarray(labels)
+    k = int(labels.max()) + 1 if centroids is None else centroids.shape[0]
+    if centroids is None:
+        centroids = _cluster_centers(X, labels, k)
+    counts = np.bincount(labels, minlength=k)
+    present = np.nonzero(counts)[0]
+    if present.size < 2:
+        return float("nan")
+    dist_sum, _ = _within_cluster_sums(X, labels, centroids, chunk_size)
+    S = dist_sum[present] / counts[present]
+    C = np.asarray(centroids, dtype=np.float64)[present]
+    M = np.sqrt(np.sum((C[:, None, :] - C[None, :, :]) ** 2, axis=2))
+    np.fill_diagonal(M, np.inf)
+    R = (S[:, None] + S[None, :]) / np.maximum(M, np.finfo(np.float64).tiny)
+    return float(np.mean(R.max(axis=1)))
+
+
+def calinski_harabasz_score_chunked(X, labels, centroids=None, chunk_size=4096):
+    """
+    Chỉ số Calinski–Harabasz (càng lớn càng tốt)
+    Args:
+        X: dữ liệu (n_samples, n_features)
+        labels: nhãn cụm của từng điểm
+        centroids: tâm cụm (k, n_features), None = tính trung bình theo labels
+        chunk_size: số dòng mỗi khối
+    Returns:
+        Calinski–Harabasz (NaN nếu số cụm khác rỗng < 2 hoặc = số điểm)
+    """
+    labels = np.asarray(labels)
+    n = X.shape[0]
+    k = int(labels.max()) + 1 if centroids is None else centroids.shape[0]
+    if centroids is None:
+        centroids = _cluster_centers(X, labels, k)
+    counts = np.bincount(labels, minlength=k)
+    n_clusters = int(np.count_nonzero(counts))
+    if n_clusters < 2 or n_clusters >= n:
+        return float("nan")
+    _, sq_sum = _within_cluster_sums(X, labels, centroids, chunk_size)
+    within = float(sq_sum.sum())
+    mean = X.mean(axis=0, dtype=np.float64)
+    between = float(np.sum(counts * np.sum((np.asarray(centroids, dtype=np.float64) - mean) ** 2, axis=1)))
+    if within == 0:
+        return float("inf")
+    return (between / (n_clusters - 1)) / (within / (n - n_clusters))
+
+
+def gap_statistic(X, k, inertia=None, n_refs=10, sample_size=None, random_state=0, **params):
+    """
+    Gap statistic cho một giá trị K
+    Dùng inertia trung bình mỗi điểm (W/n) nên dữ liệu tham chiếu có thể nhỏ hơn X (sample_size).
+    Args:
+        X: dữ liệu (n_samples, n_features)
+        k: số cụm
+        inertia: inertia của KMeansScratch đã fit trên X với K = k (None = tự fit)
+        n_refs: số bộ dữ liệu tham chiếu (phân bố đều trong hộp bao của X)
+        sample_size: số điểm mỗi bộ tham chiếu (None = n_samples)
+        random_state: seed
+        **params: tham số khác của KMeansScratch khi fit dữ liệu tham chiếu
+                  (callbacks bị bỏ qua: các lần fit tham chiếu không phải fit của người dùng)
+    Returns:
+        (gap, s_k): giá trị Gap(K) và sai số chuẩn s_K = std·sqrt(1 + 1/n_refs)
+    """
+    n = X.shape[0]
+    params = {"init": "k-means++", **params, "verbose": False, "callbacks": None}
+    if inertia is None:
+        inertia = KMeansScratch(k=k, random_state=random_state, **params).fit(X).inertia_
+    m = n if sample_size is None else min(n, sample_size)
+    lo, hi = X.min(axis=0).astype(np.float64), X.max(axis=0).astype(np.float64)
+    rng = np.random.default_rng(random_state)
+    log_w = np.empty(n_refs)
+    for b in range(n_refs):
+        ref = rng.uniform(lo, hi, size=(m, X.shape[1])).astype(_float_dtype(X))
+        ref_km = KMeansScratch(k=min(k, m), random_state=random_state + b, **params).fit(ref)
+        log_w[b] = np.log(max(ref_km.inertia_, np.finfo(np.float64).tiny) / m)
+    gap = float(log_w.mean() - np.log(max(inertia, np.finfo(np.float64).tiny) / n))
+    return gap, float(log_w.std() * np.sqrt(1 + 1 / n_refs))
+
+
+def choose_k_gap(ks, gaps, errors):
+    """K nhỏ nhất thỏa Gap(K) >= Gap(K+1) - s_(K+1) (ks tăng dần liên tiếp); không có thì lấy K có Gap lớn nhất"""
+    for i in range(len(ks) - 1):
+        if gaps[i] >= gaps[i + 1] - errors[i + 1]:
+            return ks[i]
+    return ks[int(np.nanargmax(gaps))]
+
+CLUSTER_METRICS = ("silhouette", "davies_bouldin", "calinski_harabasz", "gap")
+
+
+def cluster_quality(X, labels, centroids, metrics=CLUSTER_METRICS, inertia=None, sample_size=10_000,
+                    n_refs=10, random_state=0, **params):
+    """
+    Tính nhiều chỉ số chất lượng cho một kết quả phân cụm
+    Args:
+        X: dữ liệu (n_samples, n_features)
+        labels, centroids, inertia: kết quả của KMeansScratch
+        metrics: các chỉ số cần tính (tập con của CLUSTER_METRICS)
+        sample_size: số điểm tối đa cho silhouette xấp xỉ và mỗi bộ tham chiếu của gap
+        n_refs: số bộ tham chiếu của gap statistic
+        random_state: seed
+        **params: tham số KMeansScratch khi tính gap
+    Returns:
+        dict {tên chỉ số: giá trị}; gap trả về thêm khóa "gap_error"
+    """
+    unknown = set(metrics) - set(CLUSTER_METRICS)
+    if unknown:
+        raise ValueError(f"metrics phải thuộc {CLUSTER_METRICS}, nhận {sorted(unknown)}")
+    out = {}
+    if "silhouette" in metrics:
+        out["silhouette"] = silhouette_score_chunked(X, labels, sample_size=sample_size, random_state=random_state)
+    if "davies_bouldin" in metrics:
+        out["davies_bouldin"] = davies_bouldin_score_chunked(X, labels, centroids)
+    if "calinski_harabasz" in metrics:
+        out["calinski_harabasz"] = calinski_harabasz_score_chunked(X, labels, centroids)
+    if "gap" in metrics:
+        out["gap"], out["gap_error"] = gap_statistic(X, centroids.shape[0], inertia, n_refs=n_refs,
+                                                     sample_size=sample_size, random_state=random_state, **params)
+    return out
+
+
+# ============================================================
+# Chạy nhiều (K, seed) song song
+# ============================================================
+# Mảng X dùng chung trong mỗi process con (gắn vào shared memory một lần qua initializer)
+_SWEEP_SHARED = {}
+# Siêu tham số của model được chuyển sang gap_statistic (không chuyển callbacks, random_state, ...)
+_GAP_MODEL_PARAMS = ("max_iters", "tol", "init", "algorithm", "chunk_size")
+
+
+def _sweep_init_worker(shm_name, shape, dtype):
+    from multiprocessing import shared_memory
+
+    try:
+        # Process cha sở hữu và giải phóng vùng nhớ, process con chỉ gắn vào
+        shm = shared_memory.SharedMemory(name=shm_name, track=False)
+    except TypeError:
+        # Python < 3.13 không có track=False
+        shm = shared_memory.SharedMemory(name=shm_name)
+    _SWEEP_SHARED["shm"] = shm
+    _SWEEP_SHARED["X"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _sweep_job(k, seed, params):
+    """
+    Một công việc (K, seed): fit KMeansScratch trên X dùng chung, trả về kết quả gọn (không gửi labels)
+    kèm thời điểm bắt đầu (time.time(), so sánh được giữa các process) và thời lượng fit
+    """
+    started, start = time.time(), time.perf_counter()
+    km = KMeansScratch(k=k, random_state=seed, verbose=False, n_init=1, **params).fit(_SWEEP_SHARED["X"])
+    return k, seed, km.centroids, km.inertia_, km.n_iters_, started, time.perf_counter() - start
+
+
+def _sweep_metrics_job(k, centroids, inertia, metrics, metric_params, params):
+    """Chỉ số chất lượng cho model tốt nhất của một K, tính trên X dùng chung"""
+    X = _SWEEP_SHARED["X"]
+    model = KMeansScratch(k=k, verbose=False, **params)
+    model.centroids = centroids
+    labels = model._assign_labels(X)
+    gap_params = {key: params[key] for key in _GAP_MODEL_PARAMS if key in params}
+    return k, cluster_quality(X, labels, centroids, metrics, inertia=inertia, **metric_params, **gap_params)
+
+
+def kmeans_sweep(X, ks, n_init=1, random_state=42, n_jobs=None, metrics=None, metric_params=None, **params):
+    """
+    Fit KMeansScratch cho mọi K trong ks với n_init seed mỗi K, song song trên nhiều process
+    Args:
+        X: dữ liệu (n_samples, n_features)
+        ks: danh sách các giá trị K
+        n_init: số seed mỗi K (random_state, random_state+1, ...)
+        random_state: seed đầu tiên
+        n_jobs: số process (None = tất cả CPU, 1 = chạy tuần tự trong process hiện tại)
+        metrics: các chỉ số chất lượng tính cho model tốt nhất mỗi K (xem CLUSTER_METRICS),
+                 chạy song song như các lần fit
+        metric_params: tham số của cluster_quality (sample_size, n_refs, random_state)
+        **params: tham số khác của KMeansScratch (max_iters, tol, algorithm, init, ...);
+                  k và verbose do sweep tự đặt cho từng lần fit nên không được truyền ở đây
+    Returns:
+        dict {k: {"model", "inertia", "n_iters", "best_seed", "job_times", "wall_time", "metrics"}}
+        và thời gian tổng trong khóa "total_time". job_times là thời lượng fit của từng seed;
+        wall_time là khoảng thời gian thực từ lúc job đầu tiên của K bắt đầu tới lúc job cuối cùng
+        kết thúc (các job chạy song song nên nhỏ hơn tổng job_times)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+
+    reserved = sorted(set(params) & {"k", "verbose"})
+    if reserved:
+        raise ValueError(f"kmeans_sweep tự đặt {reserved} cho từng lần fit, không truyền qua **params")
+    X = np.ascontiguousarray(X)
+    jobs = [(k, random_state + i) for k in ks for i in range(n_init)]
+    metric_params = metric_params or {}
+    start = time.perf_counter()
+
+    def best_per_k(outputs):
+        best = {}
+        for k, seed, centroids, inertia, *_ in outputs:
+            if k not in best or inertia < best[k][1]:
+                best[k] = (centroids, inertia)
+        return [(k, c, inertia, metrics, metric_params, params) for k, (c, inertia) in best.items()]
+
+    scores = []
+    if n_jobs == 1:
+        _SWEEP_SHARED["X"] = X
+        try:
+            outputs = [_sweep_job(k, seed, params) for k, seed in jobs]
+            if metrics:
+                scores = [_sweep_metrics_job(*job) for job in best_per_k(outputs)]
+        finally:
+            # Không giữ tham chiếu tới dữ liệu của người gọi sau khi sweep kết thúc
+            _SWEEP_SHARED.pop("X", None)
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, X.nbytes))
+        try:
+            np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)[...] = X
+            workers = min(n_jobs or os.cpu_count() or 1, len(jobs))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_sweep_init_worker,
+                                     initargs=(shm.name, X.shape, X.dtype)) as pool:
+                outputs = list(pool.map(_sweep_job, *zip(*jobs), [params] * len(jobs)))
+                if metrics:
+                    scores = list(pool.map(_sweep_metrics_job, *zip(*best_per_k(outputs))))
+        finally:
+            shm.close()
+            shm.unlink()
+    total_time = time.perf_counter() - start
+
+    results = {}
+    spans = {}
+    for k, seed, centroids, inertia, n_iters, started, elapsed in outputs:
+        entry = results.setdefault(k, {"inertia": np.inf, "job_times": []})
+        entry["job_times"].append(elapsed)
+        first, last = spans.get(k, (np.inf, -np.inf))
+        spans[k] = (min(first, started), max(last, started + elapsed))
+        if inertia < entry["inertia"]:
+            entry.update(inertia=inertia, n_iters=n_iters, best_seed=seed, centroids=centroids)
+    for k, entry in results.items():
+        # Dựng lại model tốt nhất: gán nhãn một lần với centroids đã có
+        model = KMeansScratch(k=k, random_state=entry["best_seed"], verbose=False, **params)
+        model.centroids = entry.pop("centroids")
+        model.labels = model._assign_labels(X)
+        model.inertia_, model.n_iters_, model.best_seed_ = entry["inertia"], entry["n_iters"], entry["best_seed"]
+        entry["model"] = model
+        entry["wall_time"] = spans[k][1] - spans[k][0]
+    for k, values in scores:
+        results[k]["metrics"] = values
+    results["total_time"] = total_time
+    return results
+
+
+# ============================================================
+# Mini-batch K-means và K-means trực tuyến
+# ============================================================
+class MiniBatchKMeansScratch(KMeansScratch):
+    """
+    Mini-batch K-means: cập nhật centroids từ các batch ngẫu nhiên thay vì toàn bộ dữ liệu.
+    Mỗi centroid có learning rate riêng = 1 / (số điểm đã gán cho centroid đó).
+    """
+
+    def __init__(self, k, batch_size=1024, max_iters=1000, tol=0.0, max_no_improvement=10,
+                 random_state=42, verbose=False, chunk_size=4096, init="random"):
+        """
+        Args:
+            k: số lượng clusters
+            batch_size: số điểm mỗi batch
+            max_iters: số batch tối đa
+            tol: dừng khi tổng bình phương dịch chuyển của centroids < tol (0 = chỉ dùng điều kiện inertia)
+            max_no_improvement: dừng khi inertia (EWA) không giảm sau số batch này (None = tắt)
+            random_state: seed cho random
+            verbose: in inertia mỗi batch
+            chunk_size: số điểm mỗi khối khi tính khoảng cách
+            init: cách chọn tâm ban đầu từ batch đầu tiên (xem KMeansScratch)
+        """
+        super().__init__(k, max_iters=max_iters, tol=tol, random_state=random_state,
+                         verbose=verbose, chunk_size=chunk_size, init=init)
+        self.batch_size = batch_size
+        self.max_no_improvement = max_no_improvement
+        self.counts_ = None
+        self._pending = None
+
+    def _collect_initial(self, X_batch):
+        """
+        Gom các batch đầu tiên cho tới khi đủ k điểm để khởi tạo centroids
+        Returns:
+            toàn bộ điểm đã gom (kể cả X_batch) nếu đã đủ k điểm, ngược lại None (điểm được giữ lại chờ batch sau)
+        """
+        if self._pending is not None:
+            X_batch = np.concatenate([self._pending, X_batch])
+        if X_batch.shape[0] < self.k:
+            self._pending = X_batch
+            return None
+        self._pending = None
+        return X_batch
+
+    def partial_fit(self, X_batch):
+        """
+        Cập nhật centroids từ một batch dữ liệu. Khi chưa có centroids, các batch được gom lại
+        cho tới khi đủ k điểm rồi mới khởi tạo (batch đầu tiên có thể nhỏ hơn k)
+        Args:
+            X_batch: batch dữ liệu (batch_size, n_features)
+        Returns:
+            self
+        """
+        if self.centroids is None:
+            X_batch = self._collect_initial(X_batch)
+            if X_batch is None:
+                return self
+            # Đủ k điểm: chọn K centroids ban đầu từ các điểm đã gom
+            if self.init == "random":
+                rng = np.random.default_rng(self.random_state)
+                self.centroids = X_batch[rng.choice(X_batch.shape[0], self.k, replace=False)] \
+                    .astype(_float_dtype(X_batch))
+            else:
+                self.centroids = self._init_centroids(X_batch)[0]
+            self.counts_ = np.zeros(self.k, dtype=np.int64)
+
+        labels = self._assign_labels(X_batch)
+        batch_counts = np.bincount(labels, minlength=self.k)
+        batch_sums = np.empty(self.centroids.shape)
+        for f in range(X_batch.shape[1]):
+            batch_sums[:, f] = np.bincount(labels, weights=X_batch[:, f], minlength=self.k)
+
+        self.counts_ += batch_counts
+        hit = batch_counts > 0
+        # c_j += (tổng(x) - |B_j|·c_j) / N_j  <=>  learning rate 1/N_j cho từng điểm
+        self.centroids[hit] += (batch_sums[hit] - batch_counts[hit, None] * self.centroids[hit]) \
+            / self.counts_[hit, None]
+        self._batch_labels = labels
+        return self
+
+    def fit(self, X):
+        """
+        Fit mini-batch K-means trên X (lấy batch ngẫu nhiên có hoàn lại)
+        Args:
+            X: dữ liệu (n_samples, n_features)
+        Returns:
+            self
+        """
+        n = X.shape[0]
+        if self.k < 1:
+            raise ValueError("k phải >= 1")
+        if self.k > n:
+            raise ValueError(f"k={self.k} > số điểm n={n}. Không hợp lệ.")
+        rng = np.random.default_rng(self.random_state)
+        batch_size = min(self.batch_size, n)
+        self.centroids, self._pending = None, None
+        ewa_inertia, best_inertia, no_improvement = None, np.inf, 0
+        alpha = min(1.0, 2.0 * batch_size / (n + 1))
+
+        self.n_iters_ = self.max_iters
+        for it in range(1, self.max_iters + 1):
+            batch = X[rng.integers(0, n, batch_size)]
+            old_centroids = None if self.centroids is None else self.centroids.copy()
+            self.partial_fit(batch)
+
+            # Inertia trung bình trên batch (tính với centroids trước khi cập nhật)
+            if old_centroids is None:
+                continue
+            batch_inertia = np.sum((batch - old_centroids[self._batch_labels]) ** 2, dtype=np.float64) / batch_size
+            ewa_inertia = batch_inertia if ewa_inertia is None \
+                else ewa_inertia * (1 - alpha) + batch_inertia * alpha
+            shift = float(np.sum((self.centroids - old_centroids) ** 2))
+            if self.verbose:
+                print(f"Batch {it}: inertia/điểm = {batch_inertia:.6f}, EWA = {ewa_inertia:.6f}, "
+                      f"dịch chuyển = {shift:.3e}")
+
+            # Điều kiện dừng 1: centroids gần như không đổi
+            if shift < self.tol:
+                self.n_iters_ = it
+                break
+            # Điều kiện dừng 2: inertia (EWA) không cải thiện sau max_no_improvement batch
+            if ewa_inertia < best_inertia:
+                best_inertia, no_improvement = ewa_inertia, 0
+            else:
+                no_improvement += 1
+            if self.max_no_improvement is not None and no_improvement >= self.max_no_improvement:
+                self.n_iters_ = it
+                break
+
+        # Gán nhãn và tính inertia trên toàn bộ dữ liệu với centroids cuối cùng
+        self.labels = self._assign_labels(X)
+        self.inertia_ = self._compute_inertia(X)
+        return self
+
+
+class OnlineKMeansScratch(MiniBatchKMeansScratch):
+    """
+    K-means trực tuyến: hấp thụ batch mới trong O(batch), fit lại khi inertia tăng quá ngưỡng (drift).
+    Lần fit lại chỉ dùng dữ liệu gần đây chứ không phải mẫu đều của toàn bộ lịch sử (mẫu đều sau
+    khi trôi chủ yếu là dữ liệu cũ nên sẽ học lại phân phối cũ): các điểm từ lúc drift bắt đầu, tức
+    batch đầu tiên của chuỗi batch liên tiếp có inertia/điểm vượt ngưỡng, trong cửa sổ trượt
+    buffer_size điểm gần nhất. Nếu drift tăng dần mà không batch nào vượt ngưỡng thì dùng cả cửa sổ.
+    """
+
+    def __init__(self, k, drift_threshold=0.5, ewa_alpha=0.2, buffer_size=10_000, max_iters=100,
+                 tol=1e-8, random_state=42, verbose=False, chunk_size=4096, init="k-means++"):
+        """
+        Args:
+            k: số lượng clusters
+            drift_threshold: fit lại khi EWA inertia/điểm > (1 + drift_threshold) × mốc tham chiếu
+            ewa_alpha: hệ số trung bình trượt của inertia/điểm các batch mới
+            buffer_size: số điểm gần nhất giữ lại (cửa sổ trượt) để fit lại
+            max_iters, tol: tham số của mỗi lần fit đầy đủ (Lloyd)
+            random_state: seed cho random
+            verbose: in drift mỗi batch và thông báo khi fit lại
+            chunk_size: số điểm mỗi khối khi tính khoảng cách
+            init: cách chọn tâm ban đầu mỗi lần fit đầy đủ (xem KMeansScratch)
+        """
+        super().__init__(k, max_iters=max_iters, tol=tol, random_state=random_state,
+                         verbose=verbose, chunk_size=chunk_size, init=init)
+        self.drift_threshold = drift_threshold
+        self.ewa_alpha = ewa_alpha
+        self.buffer_size = buffer_size
+        self.n_seen_ = 0
+        self.n_refits_ = 0
+        self.drift_ = 0.0
+        self.reference_inertia_ = None
+        self._drift_start = None
+
+    def _refit(self, X):
+        """Fit đầy đủ (Lloyd) trên X rồi đặt lại số điểm mỗi cụm và mốc inertia tham chiếu"""
+        verbose, self.verbose = self.verbose, False
+        KMeansScratch.fit(self, X)
+        self.verbose = verbose
+        self.counts_ = np.bincount(self.labels, minlength=self.k).astype(np.int64)
+        self.reference_inertia_ = self.inertia_ / X.shape[0]
+        self._ewa_inertia = self.reference_inertia_
+        self.drift_ = 0.0
+        self._drift_start = None
+
+    def _update_buffer(self, X_batch):
+        """Cửa sổ trượt (bộ đệm vòng): điểm mới ghi đè lên điểm cũ nhất, buffer luôn là buffer_size điểm gần nhất"""
+        self.n_seen_ += X_batch.shape[0]
+        X_batch = X_batch[-self.buffer_size:]
+        pos = (self._buffer_pos + np.arange(X_batch.shape[0])) % self.buffer_size
+        self._buffer[pos] = X_batch
+        self._buffer_pos = (self._buffer_pos + X_batch.shape[0]) % self.buffer_size
+        self._buffer_len = min(self.buffer_size, self._buffer_len + X_batch.shape[0])
+
+    def _recent(self, n):
+        """n điểm gần nhất trong cửa sổ trượt (n <= _buffer_len)"""
+        return self._buffer[(self._buffer_pos - n + np.arange(n)) % self.buffer_size]
+
+    def fit(self, X):
+        """
+        Fit đầy đủ trên X và khởi tạo trạng thái trực tuyến (buffer, mốc tham chiếu)
+        Args:
+            X: dữ liệu (n_samples, n_features)
+        Returns:
+            self
+        """
+        self._buffer = np.empty((self.buffer_size, X.shape[1]), dtype=_float_dtype(X))
+        self._buffer_len, self._buffer_pos = 0, 0
+        self._pending = None
+        self.n_seen_ = 0
+        self.n_refits_ = 0
+        self._refit(X)
+        self._update_buffer(X)
+        return self
+
+    def partial_fit(self, X_batch):
+        """
+        Hấp thụ một batch mới: gán nhãn, cập nhật centroids/số điểm mỗi cụm, fit lại nếu có drift.
+        Khi chưa fit, các batch được gom lại cho tới khi đủ k điểm rồi mới fit đầy đủ lần đầu
+        Args:
+            X_batch: batch dữ liệu (batch_size, n_features)
+        Returns:
+            self
+        """
+        if self.centroids is None:
+            X_init = self._collect_initial(X_batch)
+            return self if X_init is None else self.fit(X_init)
+        old_centroids = self.centroids.copy()
+        n_seen_before = self.n_seen_
+        super().partial_fit(X_batch)
+        self._update_buffer(X_batch)
+
+        # Inertia/điểm của batch với centroids trước khi cập nhật (dữ liệu "chưa thấy")
+        diff = X_batch - old_centroids[self._batch_labels]
+        batch_inertia = float(np.sum(diff * diff, dtype=np.float64)) / X_batch.shape[0]
+        # Mốc bắt đầu drift: batch đầu tiên của chuỗi batch liên tiếp vượt ngưỡng
+        if batch_inertia <= (1.0 + self.drift_threshold) * self.reference_inertia_:
+            self._drift_start = None
+        elif self._drift_start is None:
+            self._drift_start = n_seen_before
+        self._ewa_inertia += self.ewa_alpha * (batch_inertia - self._ewa_inertia)
+        self.drift_ = self._ewa_inertia / self.reference_inertia_ - 1.0 if self.reference_inertia_ > 0 else 0.0
+        if self.verbose:
+            print(f"Batch: inertia/điểm = {batch_inertia:.6f}, EWA = {self._ewa_inertia:.6f}, "
+                  f"drift = {100 * self.drift_:+.1f}%")
+        if self.drift_ > self.drift_threshold:
+            n_recent = self._buffer_len if self._drift_start is None else \
+                min(self._buffer_len, max(self.k, self.n_seen_ - self._drift_start))
+            if self.verbose:
+                print(f"  → Drift vượt ngưỡng {100 * self.drift_threshold:.0f}%: fit lại trên "
+                      f"{n_recent} điểm gần nhất")
+            self._refit(self._recent(n_recent))
+            self.n_refits_ += 1
+        return self
+
+    def predict(self, X):
+        """Gán mỗi điểm của X vào cluster gần nhất (không cập nhật mô hình)"""
+        return self._assign_labels(X)
+
+
+# ============================================================
+# Đọc dữ liệu, vẽ hình và dòng lệnh (CLI)
+# ============================================================
+def load_data(path, columns=None, dtype=None):
+    """
+    Đọc dữ liệu từ file .npy (mở dạng memmap, không nạp toàn bộ vào RAM) hoặc .csv (pandas)
+    Args:
+        path: đường dẫn file .npy hoặc .csv
+        columns: các cột cần dùng với CSV (None = mọi cột số)
+        dtype: kiểu dữ liệu mong muốn (None = giữ nguyên với .npy, float64 với .csv)
+    Returns:
+        (X, feature_names)
+    """
+    if path.endswith(".npy"):
+        X = np.load(path, mmap_mode="r")
+        if X.ndim == 1:
+            X = X.reshape(-1, 1)
+        if dtype is not None and X.dtype != dtype:
+            X = X.astype(dtype)
+        return X, [f"x{i}" for i in range(X.shape[1])]
+    import pandas as pd
+
+    df = pd.read_csv(path, usecols=columns)
+    if columns is None:
+        df = df.select_dtypes(include="number")
+    else:
+        df = df[columns]
+    return df.to_numpy(dtype=dtype or np.float64), list(df.columns)
+
+
+def plot_clusters(X, labels, centroids, feature_names=None, path=None, title="K-means"):
+    """
+    Vẽ scatter 2 đặc trưng đầu tiên tô màu theo cụm, đánh dấu centroids
+    Args:
+        path: lưu hình ra file (None = plt.show())
+    """
+    import matplotlib.pyplot as plt
+
+    names = feature_names or ["x0", "x1"]
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.scatter(X[:, 0], X[:, 1], c=labels, cmap="viridis", s=20)
+    ax.scatter(centroids[:, 0], centroids[:, 1], marker="X", s=200, c="red", edgecolors="black")
+    ax.set_xlabel(names[0])
+    ax.set_ylabel(names[1])
+    ax.set_title(title)
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path)
+        plt.close(fig)
+
+
+def measure_import_time(repeat=5):
+    """
+    Đo thời gian import module trong process Python mới (lấy nhỏ nhất trong repeat lần)
+    Returns:
+        dict {"numpy_ms", "module_ms", "lazy_loaded"}: lazy_loaded = các thư viện nặng bị nạp sớm
+    """
+    import json
+    import subprocess
+
+    code = (
+        "import json, sys, time\n"
+        "t0 = time.perf_counter()\nimport numpy\nt1 = time.perf_counter()\n"
+        "import KMeans_BT05\nt2 = time.perf_counter()\n"
+        f"lazy = [m for m in {LAZY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps([1000 * (t1 - t0), 1000 * (t2 - t1), lazy]))\n"
+    )
+    here = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], cwd=here, check=True,
+                                capture_output=True, text=True).stdout
+        runs.append(json.loads(output))
+    numpy_ms, module_ms, lazy = min(runs, key=lambda r: r[1])
+    return {"numpy_ms": numpy_ms, "module_ms": module_ms, "lazy_loaded": lazy}
+
+
+def _save_labels(path, labels):
+    if path.endswith(".npy"):
+        np.save(path, labels)
+    else:
+        np.savetxt(path, labels, fmt="%d", header="Cluster", comments="")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Phân cụm K-means (KMeansScratch) cho file CSV/NPY")
+    parser.add_argument("input", nargs="?", help="file dữ liệu .csv hoặc .npy")
+    parser.add_argument("--columns", nargs="+", help="các cột dùng để phân cụm (CSV)")
+    parser.add_argument("--k", type=int, nargs="+", default=[3],
+                        help="số cụm; nhiều giá trị = chạy sweep và chọn K có silhouette lớn nhất")
+    parser.add_argument("--init", default="k-means++", choices=KMeansScratch.INIT_METHODS)
+    parser.add_argument("--algorithm", default="lloyd", choices=("lloyd", "hamerly"))
+    parser.add_argument("--n-init", type=int, default=1, help="số seed mỗi K, giữ inertia nhỏ nhất")
+    parser.add_argument("--max-iters", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--n-jobs", type=int, default=None, help="số process khi chạy nhiều K")
+    parser.add_argument("--float32", action="store_true", help="tính toán bằng float32")
+    parser.add_argument("--no-standardize", action="store_true", help="không chuẩn hóa Z-score")
+    parser.add_argument("--output", help="ghi nhãn cụm ra file .npy hoặc .csv")
+    parser.add_argument("--plot", help="lưu biểu đồ scatter 2 đặc trưng đầu tiên ra file ảnh")
+    parser.add_argument("--trace", help="ghi thời gian và số liệu từng vòng lặp ra file .json hoặc .csv")
+    parser.add_argument("--check-import-time", action="store_true",
+                        help=f"đo thời gian import module, báo lỗi nếu vượt {IMPORT_BUDGET_MS:.0f}ms")
+    args = parser.parse_args(argv)
+
+    if args.check_import_time:
+        result = measure_import_time()
+        print(f"import numpy: {result['numpy_ms']:.1f}ms, import KMeans_BT05: {result['module_ms']:.1f}ms "
+              f"(ngân sách {IMPORT_BUDGET_MS:.0f}ms)")
+        if result["lazy_loaded"]:
+            print(f"✗ Các thư viện bị import sớm: {result['lazy_loaded']}")
+        ok = result["module_ms"] <= IMPORT_BUDGET_MS and not result["lazy_loaded"]
+        print("✓ Đạt ngân sách import" if ok else "✗ Vượt ngân sách import")
+        return 0 if ok else 1
+    if args.input is None:
+        parser.error("cần file dữ liệu đầu vào (hoặc --check-import-time)")
+
+    X, names = load_data(args.input, args.columns, np.float32 if args.float32 else None)
+    if args.no_standardize:
+        X_fit = X
+    else:
+        X_fit, mean, std = zscore_fit_transform(X)
+    params = dict(init=args.init, algorithm=args.algorithm, max_iters=args.max_iters, tol=1e-8)
+    recorder = FitRecorder() if args.trace else None
+    if recorder is not None:
+        if len(args.k) > 1 and args.n_jobs != 1:
+            parser.error("--trace với nhiều K cần --n-jobs 1 (callback không chạy được ở process con)")
+        params["callbacks"] = [recorder]
+
+    print("=" * 70)
+    print(f"K-MEANS: {args.input} ({X.shape[0]:,} điểm × {X.shape[1]} đặc trưng, {X_fit.dtype})")
+    print("=" * 70)
+    start = time.perf_counter()
+    if len(args.k) == 1:
+        model = KMeansScratch(k=args.k[0], random_state=args.seed, verbose=False, n_init=args.n_init,
+                              **params).fit(X_fit)
+    else:
+        sweep = kmeans_sweep(X_fit, args.k, n_init=args.n_init, random_state=args.seed, n_jobs=args.n_jobs,
+                             metrics=("silhouette",), **params)
+        for k in args.k:
+            print(f"K={k}: inertia = {sweep[k]['inertia']:.6f}, "
+                  f"silhouette = {sweep[k]['metrics']['silhouette']:.4f}")
+        scored = [k for k in args.k if not np.isnan(sweep[k]["metrics"]["silhouette"])]
+        best = max(scored, key=lambda k: sweep[k]["metrics"]["silhouette"]) if scored else args.k[0]
+        model = sweep[best]["model"]
+        print(f"→ Chọn K={best} (silhouette lớn nhất)")
+    elapsed = time.perf_counter() - start
+
+    centroids = model.centroids if args.no_standardize else zscore_inverse_transform(model.centroids, mean, std)
+    counts = np.bincount(model.labels, minlength=model.k)
+    print(f"\nK={model.k}, inertia = {model.inertia_:.6f}, {model.n_iters_} vòng lặp, {elapsed:.3f}s")
+    print(f"Tâm cụm theo đơn vị gốc {names}:")
+    for j, c in enumerate(centroids):
+        print(f"  Cụm {j} ({counts[j]:,} điểm): " + ", ".join(f"{v:.4f}" for v in c))
+    if args.output:
+        _save_labels(args.output, model.labels)
+        print(f"Đã ghi nhãn cụm vào {args.output}")
+    if recorder is not None:
+        if args.trace.endswith(".csv"):
+            recorder.to_csv(args.trace)
+        else:
+            recorder.to_json(args.trace)
+        totals = recorder.totals()
+        print(f"Đã ghi {len(recorder.records)} vòng lặp vào {args.trace} (assign {totals['assign_s']:.3f}s, "
+              f"update {totals['update_s']:.3f}s, inertia {totals['inertia_s']:.3f}s)")
+    if args.plot:
+        plot_clusters(np.asarray(X), model.labels, centroids, names, path=args.plot, title=f"K-means (K={model.k})")
+        print(f"Đã lưu biểu đồ vào {args.plot}")
+    print("=" * 70)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
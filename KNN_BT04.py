@@ -1,3 +1,8 @@
+import heapq
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 from sklearn.neighbors import KNeighborsRegressor
 
@@ -13,9 +18,8 @@ k_value = 3
 X = np.array(data['Experience']).reshape(-1, 1)
 y = np.array(data['Salary'])
 
-print("=" * 60)
-print("BÀI TẬP KNN - DỰ ĐOÁN LƯƠNG THEO KINH NGHIỆM")
-print("=" * 60)
+# Giới hạn bộ nhớ cho mảng trung gian khi tính khoảng cách theo lô (bytes)
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
 
 # Hàm in bảng chi tiết với ký tự ASCII đơn giản (tương thích Windows)
 def print_neighbors_table(neighbors_data, title="K láng giềng gần nhất"):
@@ -36,25 +40,47 @@ def print_neighbors_table(neighbors_data, title="K láng giềng gần nhất"):
         print(f"│ {exp:^15.1f} │ {salary:^15.1f} │ {dist:^15.2f} │")
     print("└─────────────────┴─────────────────┴─────────────────┘")
 # Câu 1: Tạo hàm knn_predictor tự cài đặt
-def knn_predictor(X_train, y_train, x_test, k=3, verbose=True):
+def knn_predictor(X_train, y_train, x_test, k=3, verbose=True, algorithm='brute', tree=None,
+                  metric='euclidean', p=2, weights='uniform'):
     """
     Hàm dự đoán KNN tự cài đặt
     
     Parameters:
     - X_train: mảng các giá trị experience huấn luyện
     - y_train: mảng các giá trị salary tương ứng
-    - x_test: giá trị experience cần dự đoán
+    - x_test: giá trị experience cần dự đoán (số thực hoặc vector n đặc trưng)
     - k: số lượng láng giềng gần nhất
     - verbose: True = in chi tiết, False = không in
+    - algorithm: 'brute' = quét toàn bộ, 'kd_tree' / 'ball_tree' = xây cây không gian cho lần gọi
+      này, 'auto' = quét toàn bộ bằng numpy (với một query, xây cây tốn hơn quét toàn bộ)
+    - tree: cây đã xây sẵn từ X_train (build_tree) để dùng lại giữa các lần gọi. Hàm không giữ trạng
+      thái nên gọi nhiều lần trên cùng X_train thì truyền tree, hoặc dùng KNNRegressor (giữ cây sau fit)
+    - metric: 'euclidean', 'manhattan', 'minkowski' hoặc 'cosine'
+    - p: bậc của khoảng cách Minkowski (chỉ dùng khi metric='minkowski')
+    - weights: 'uniform' = trung bình thường, 'distance' = trọng số nghịch đảo khoảng cách
     Returns:
     - Giá trị salary dự đoán
     """
-    # Tính khoảng cách Euclidean từ điểm test đến tất cả điểm train
-    distances = []
-    for i in range(len(X_train)):
-        # Khoảng cách Euclidean
-        dist = np.sqrt((X_train[i][0] - x_test) ** 2)
-        distances.append((dist, y_train[i], X_train[i][0]))
+    x_vec = np.atleast_1d(np.asarray(x_test, dtype=float)).ravel()
+    query = x_vec.reshape(1, -1)
+    neighbors = None  # (dist, idx) của query khi không dùng vòng lặp Python bên dưới
+    if tree is not None:
+        neighbors = tree.query(query, k=k)
+    elif algorithm == 'auto':
+        # Quét toàn bộ X_train bằng numpy (cùng thứ tự láng giềng với sort ổn định bên dưới)
+        neighbors = _brute_kneighbors(DistanceEngine(X_train, metric=metric, p=p), query, k)
+    elif algorithm != 'brute':
+        neighbors = build_tree(X_train, algorithm=algorithm, metric=metric, p=p).query(query, k=k)
+
+    if neighbors is not None:
+        dist, idx = neighbors
+        distances = [(d, y_train[i], X_train[i][0]) for d, i in zip(dist[0], idx[0])]
+    else:
+        # Tính khoảng cách từ điểm test đến tất cả điểm train (dùng mọi cột đặc trưng)
+        distances = []
+        for i in range(len(X_train)):
+            dist = point_distance(X_train[i], x_vec, metric=metric, p=p)
+            distances.append((dist, y_train[i], X_train[i][0]))
     
     # Sắp xếp theo khoảng cách tăng dần
     distances.sort(key=lambda x: x[0])
@@ -66,72 +92,1094 @@ def knn_predictor(X_train, y_train, x_test, k=3, verbose=True):
         print_neighbors_table(neighbors_data, f"{k} láng giềng gần nhất với experience = {x_test}")
     
     # Tính trung bình salary của k láng giềng (cho bài toán hồi quy)
-    predicted_salary = np.mean([salary for _, salary, _ in k_nearest])
+    k_dist = np.array([dist for dist, _, _ in k_nearest])
+    k_salary = np.array([salary for _, salary, _ in k_nearest])
+    predicted_salary = _weighted_mean(k_salary[None, :], k_dist[None, :], weights)[0]
     
     return predicted_salary
 
 
-print("\n" + "=" * 60)
-print("CÂU 1: SỬ DỤNG HÀM TỰ CÀI ĐẶT knn_predictor")
-print("=" * 60)
-
-# In chi tiết với ASCII đơn giản (use_unicode=False để tránh lệch trên Windows)
-predicted_salary_custom = knn_predictor(X, y, test_experience, k=k_value, verbose=True)
-print(f"\nDự đoán salary với experience = {test_experience} (k={k_value}):")
-print(f"Salary dự đoán = {predicted_salary_custom:.2f}")
-
-# Câu 2: So sánh với sklearn
-print("\n" + "=" * 60)
-print("CÂU 2: SO SÁNH VỚI THƯ VIỆN SKLEARN")
-print("=" * 60)
-
-# Tạo mô hình KNN với sklearn
-knn_sklearn = KNeighborsRegressor(n_neighbors=k_value)
-knn_sklearn.fit(X, y)
-
-# Dự đoán với sklearn
-X_test = np.array([[test_experience]])
-predicted_salary_sklearn = knn_sklearn.predict(X_test)[0]
-
-print(f"\nDự đoán salary với experience = {test_experience} (k={k_value}):")
-print(f"Salary dự đoán (sklearn) = {predicted_salary_sklearn:.2f}")
-
-# Tìm k láng giềng gần nhất từ sklearn
-distances_sklearn, indices_sklearn = knn_sklearn.kneighbors(X_test)
-
-neighbors_sklearn = [(X[idx][0], y[idx], dist) for idx, dist in zip(indices_sklearn[0], distances_sklearn[0])]
-print_neighbors_table(neighbors_sklearn, f"{k_value} láng giềng gần nhất (theo sklearn)")
-
-# So sánh kết quả
-print("\n" + "=" * 60)
-print("SO SÁNH KẾT QUẢ")
-print("=" * 60)
-print(f"Dự đoán từ hàm tự cài đặt: {predicted_salary_custom:.2f}")
-print(f"Dự đoán từ sklearn:         {predicted_salary_sklearn:.2f}")
-
-if abs(predicted_salary_custom - predicted_salary_sklearn) < 0.001:
-    print("\n✓ Kết quả KHỚP HOÀN TOÀN! Hàm tự cài đặt chính xác.")
-else:
-    print("\n✗ Có sự khác biệt nhỏ giữa hai phương pháp.")
-
-# Thử nghiệm với các giá trị k khác nhau
-print("\n" + "=" * 60)
-print("THỰC NGHIỆM VỚI CÁC GIÁ TRỊ K KHÁC NHAU")
-print("=" * 60)
-print("┌─────────────────┬─────────────────┬─────────────────┐")
-print("│       K         │   KNN (custom)  │   KNN (sklearn) │")
-print("├─────────────────┼─────────────────┼─────────────────┤")
-
-for k in [1, 3, 5, 7]:
-    # KHÔNG in chi tiết (verbose=False) để tránh output dài
-    pred_custom = knn_predictor(X, y, test_experience, k=k, verbose=False)
-    
-    knn_temp = KNeighborsRegressor(n_neighbors=k)
-    knn_temp.fit(X, y)
-    pred_sklearn = knn_temp.predict(X_test)[0]
-    
-    diff = abs(pred_custom - pred_sklearn)
-    print(f"│ {k:^15.1f} │ {pred_custom:^15.1f} │ {pred_sklearn:^15.1f} │")
+def _topk_indices(distances, k):
+    """
+    Chọn chỉ số k láng giềng gần nhất trên mỗi hàng của ma trận khoảng cách
+
+    Dùng np.argpartition (O(n)) thay vì sắp xếp toàn bộ. Kết quả có cùng thứ tự
+    với sort ổn định của knn_predictor: khoảng cách tăng dần, bằng nhau thì
+    ưu tiên chỉ số nhỏ hơn.
+
+    Parameters:
+    - distances: ma trận khoảng cách (n_queries, n_train)
+    - k: số láng giềng cần lấy
+    Returns:
+    - Ma trận chỉ số (n_queries, k)
+    """
+    n_train = distances.shape[1]
+    if k >= n_train:
+        return np.argsort(distances, axis=1, kind='stable')[:, :n_train]
+
+    idx = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    # Khoảng cách lớn thứ k trong nhóm được chọn (chính là phần tử ở vị trí k-1)
+    kth = np.take_along_axis(distances, idx, axis=1).max(axis=1, keepdims=True)
+    # Nếu có điểm hòa tại biên thì argpartition có thể chọn sai chỉ số -> sort ổn định lại các hàng đó
+    ties = (distances <= kth).sum(axis=1) > k
+    if ties.any():
+        idx[ties] = np.argsort(distances[ties], axis=1, kind='stable')[:, :k]
+
+    # Sắp xếp k láng giềng theo (khoảng cách, chỉ số)
+    idx = np.sort(idx, axis=1)
+    order = np.argsort(np.take_along_axis(distances, idx, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(idx, order, axis=1)
+
+
+# ============================================================
+# Bộ tính khoảng cách (distance engine) cho dữ liệu nhiều chiều
+# ============================================================
+METRICS = ('euclidean', 'manhattan', 'minkowski', 'cosine')
+WEIGHTS = ('uniform', 'distance')
+
+
+def _minkowski_order(metric, p=2):
+    """Bậc p tương ứng với metric ('euclidean' = 2, 'manhattan' = 1), None nếu là cosine"""
+    if metric not in METRICS:
+        raise ValueError(f"metric phải là một trong {METRICS}, nhận '{metric}'")
+    if metric == 'euclidean':
+        return 2
+    if metric == 'manhattan':
+        return 1
+    if metric == 'minkowski':
+        if p < 1:
+            raise ValueError(f"Minkowski yêu cầu p >= 1, nhận p={p}")
+        return p
+    return None
+
+
+def _minkowski_norm(diff, p):
+    """Chuẩn Minkowski bậc p theo trục cuối"""
+    if p == 1:
+        return np.sum(np.abs(diff), axis=-1)
+    if p == 2:
+        return np.sqrt(np.sum(diff ** 2, axis=-1))
+    if np.isinf(p):
+        return np.max(np.abs(diff), axis=-1)
+    return np.sum(np.abs(diff) ** p, axis=-1) ** (1.0 / p)
+
+
+def point_distance(a, b, metric='euclidean', p=2):
+    """Khoảng cách giữa hai vector a, b theo metric"""
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    order = _minkowski_order(metric, p)
+    if order is not None:
+        return float(_minkowski_norm(a - b, order))
+    na, nb = np.linalg.norm(a), np.linalg.norm(b)
+    # Vector 0 được coi là có chuẩn 1 (cùng quy ước với sklearn)
+    return float(1.0 - np.dot(a, b) / ((na if na > 0 else 1.0) * (nb if nb > 0 else 1.0)))
+
+
+class DistanceEngine:
+    """
+    Tính ma trận khoảng cách giữa các query và tập huấn luyện
+
+    - euclidean: dùng đẳng thức ||a - b||² = ||a||² + ||b||² - 2a·b, phần a·b là
+      một phép nhân ma trận (BLAS), ||b||² của tập huấn luyện được tính sẵn một lần
+    - cosine: chuẩn hóa trước các dòng huấn luyện, còn lại là một phép nhân ma trận
+    - manhattan / minkowski: broadcasting theo lô (không có dạng GEMM)
+    """
+
+    def __init__(self, X_train, metric='euclidean', p=2):
+        """
+        Parameters:
+        - X_train: ma trận huấn luyện (n_train, n_features)
+        - metric: một trong METRICS
+        - p: bậc Minkowski (chỉ dùng khi metric='minkowski')
+        """
+        self.X_train = np.asarray(X_train, dtype=float)
+        if self.X_train.ndim == 1:
+            self.X_train = self.X_train.reshape(-1, 1)
+        self.order = _minkowski_order(metric, p)
+        # minkowski p=2 chính là euclidean -> dùng nhánh GEMM
+        self.metric = 'cosine' if self.order is None else ('euclidean' if self.order == 2 else 'minkowski')
+
+        if self.metric == 'euclidean':
+            self._train_sq = np.einsum('ij,ij->i', self.X_train, self.X_train)
+        elif self.metric == 'cosine':
+            norms = np.sqrt(np.einsum('ij,ij->i', self.X_train, self.X_train))
+            self._train_unit = self.X_train / np.where(norms == 0, 1.0, norms)[:, None]
+
+    def chunk_rows(self, max_bytes=DEFAULT_CHUNK_BYTES):
+        """Số query tối đa mỗi lô sao cho mảng trung gian không vượt max_bytes"""
+        n_train, n_features = self.X_train.shape
+        per_row = n_train * 8 if self.metric != 'minkowski' else n_train * n_features * 8
+        return max(1, int(max_bytes // max(1, per_row)))
+
+    def pairwise(self, X_test):
+        """
+        Ma trận khoảng cách (n_queries, n_train)
+
+        Parameters:
+        - X_test: ma trận query (n_queries, n_features)
+        """
+        X_test = np.asarray(X_test, dtype=float)
+        if self.metric == 'euclidean':
+            d2 = self.X_train @ X_test.T
+            d2 = d2.T
+            d2 *= -2.0
+            d2 += np.einsum('ij,ij->i', X_test, X_test)[:, None]
+            d2 += self._train_sq[None, :]
+            # Sai số làm tròn có thể cho giá trị âm rất nhỏ
+            np.maximum(d2, 0.0, out=d2)
+            return np.sqrt(d2, out=d2)
+        if self.metric == 'cosine':
+            norms = np.sqrt(np.einsum('ij,ij->i', X_test, X_test))
+            unit = X_test / np.where(norms == 0, 1.0, norms)[:, None]
+            return 1.0 - unit @ self._train_unit.T
+        return _minkowski_norm(X_test[:, None, :] - self.X_train[None, :, :], self.order)
+
+
+def _weighted_mean(y_neighbors, dist_neighbors, weights='uniform'):
+    """
+    Trung bình (có trọng số) của y theo từng hàng láng giềng
+
+    weights='distance': trọng số 1/d; nếu hàng có láng giềng trùng điểm query
+    (d = 0) thì chỉ lấy trung bình các láng giềng đó.
+    """
+    if weights not in WEIGHTS:
+        raise ValueError(f"weights phải là một trong {WEIGHTS}, nhận '{weights}'")
+    if weights == 'uniform':
+        return y_neighbors.mean(axis=1)
+    zero = dist_neighbors == 0
+    with np.errstate(divide='ignore'):
+        w = 1.0 / dist_neighbors
+    has_zero = zero.any(axis=1)
+    w[has_zero] = zero[has_zero]
+    return np.sum(w * y_neighbors, axis=1) / np.sum(w, axis=1)
+
+
+def knn_predict_batch(X_train, y_train, X_test, k=3, chunk_size=None, max_bytes=DEFAULT_CHUNK_BYTES,
+                      metric='euclidean', p=2, weights='uniform'):
+    """
+    Dự đoán KNN cho cả ma trận query cùng lúc (vectorized)
+
+    Khoảng cách được tính bằng DistanceEngine theo từng lô query để giới hạn
+    bộ nhớ, top-k được chọn bằng argpartition.
+
+    Parameters:
+    - X_train: ma trận huấn luyện (n_train, n_features)
+    - y_train: mảng giá trị mục tiêu (n_train,)
+    - X_test: ma trận query (n_queries, n_features) hoặc mảng 1 chiều các giá trị
+    - k: số lượng láng giềng gần nhất
+    - chunk_size: số query mỗi lô (None = tự tính theo max_bytes)
+    - max_bytes: giới hạn bộ nhớ cho mảng trung gian mỗi lô
+    - metric, p: khoảng cách sử dụng (xem DistanceEngine)
+    - weights: 'uniform' hoặc 'distance'
+    Returns:
+    - Mảng giá trị dự đoán (n_queries,)
+    """
+    X_train = np.asarray(X_train, dtype=float)
+    y_train = np.asarray(y_train, dtype=float)
+    X_test = np.asarray(X_test, dtype=float)
+    if X_train.ndim == 1:
+        X_train = X_train.reshape(-1, 1)
+    if X_test.ndim == 1:
+        X_test = X_test.reshape(-1, X_train.shape[1])
+    if X_test.shape[1] != X_train.shape[1]:
+        raise ValueError(f"X_test có {X_test.shape[1]} đặc trưng, X_train có {X_train.shape[1]}")
+    if not 1 <= k <= X_train.shape[0]:
+        raise ValueError(f"k={k} phải nằm trong [1, {X_train.shape[0]}]")
+
+    engine = DistanceEngine(X_train, metric=metric, p=p)
+    dist, idx = _brute_kneighbors(engine, X_test, k, chunk_size, max_bytes)
+    return _weighted_mean(y_train[idx], dist, weights)
+
+
+def _brute_kneighbors(engine, X_test, k, chunk_size=None, max_bytes=DEFAULT_CHUNK_BYTES):
+    """Quét toàn bộ theo lô, trả về (distances, indices) của k láng giềng gần nhất cho mỗi query"""
+    if chunk_size is None:
+        chunk_size = engine.chunk_rows(max_bytes)
+
+    n_queries = X_test.shape[0]
+    out_dist = np.empty((n_queries, k), dtype=float)
+    out_idx = np.empty((n_queries, k), dtype=int)
+    for start in range(0, n_queries, chunk_size):
+        distances = engine.pairwise(X_test[start:start + chunk_size])
+        idx = _topk_indices(distances, k)
+        out_idx[start:start + chunk_size] = idx
+        out_dist[start:start + chunk_size] = np.take_along_axis(distances, idx, axis=1)
+    return out_dist, out_idx
+
+
+class _BinaryTree:
+    """
+    Cây nhị phân phân hoạch không gian dùng chung cho KDTree và BallTree
+
+    Mỗi nút giữ đoạn [start, end) của mảng chỉ số đã hoán vị, nút lá chứa tối đa
+    leaf_size điểm. Lớp con định nghĩa _init_node (lưu biên của nút) và
+    _min_dist (cận dưới khoảng cách từ query tới mọi điểm trong nút).
+    Hỗ trợ họ khoảng cách Minkowski (euclidean, manhattan, minkowski-p).
+    """
+
+    def __init__(self, X_train, leaf_size=16, metric='euclidean', p=2):
+        self.order = _minkowski_order(metric, p)
+        if self.order is None:
+            raise ValueError(f"Cây không gian không hỗ trợ metric '{metric}'")
+        self.data = np.asarray(X_train, dtype=float)
+        if self.data.ndim == 1:
+            self.data = self.data.reshape(-1, 1)
+        self.leaf_size = max(1, int(leaf_size))
+        self.idx = np.arange(self.data.shape[0])
+        self._start, self._end, self._left, self._right = [], [], [], []
+        self._build(0, self.data.shape[0])
+
+    def _build(self, start, end):
+        node = len(self._start)
+        self._start.append(start)
+        self._end.append(end)
+        self._left.append(-1)
+        self._right.append(-1)
+        pts = self.data[self.idx[start:end]]
+        self._init_node(pts)
+
+        if end - start > self.leaf_size:
+            # Chia theo chiều có độ trải rộng lớn nhất, tại trung vị
+            dim = int(np.argmax(pts.max(axis=0) - pts.min(axis=0)))
+            mid = (start + end) // 2
+            order = np.argpartition(pts[:, dim], mid - start)
+            self.idx[start:end] = self.idx[start:end][order]
+            self._left[node] = self._build(start, mid)
+            self._right[node] = self._build(mid, end)
+        return node
+
+    def _query_one(self, x, k):
+        # Max-heap kích thước k theo khóa (khoảng cách, chỉ số): phần tử đầu là láng giềng "xa nhất"
+        heap = []
+        stack = [(self._min_dist(0, x), 0)]
+        while stack:
+            bound, node = stack.pop()
+            # Dùng ">" thay vì ">=" để vẫn xét các điểm hòa có chỉ số nhỏ hơn
+            if len(heap) == k and bound > -heap[0][0]:
+                continue
+            left = self._left[node]
+            if left < 0:
+                ids = self.idx[self._start[node]:self._end[node]]
+                dists = _minkowski_norm(self.data[ids] - x, self.order)
+                for d, i in zip(dists.tolist(), ids.tolist()):
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-d, -i))
+                    elif (d, i) < (-heap[0][0], -heap[0][1]):
+                        heapq.heapreplace(heap, (-d, -i))
+                continue
+            right = self._right[node]
+            b_left, b_right = self._min_dist(left, x), self._min_dist(right, x)
+            # Đẩy nút xa vào trước để nút gần được duyệt trước
+            if b_left <= b_right:
+                stack.append((b_right, right))
+                stack.append((b_left, left))
+            else:
+                stack.append((b_left, left))
+                stack.append((b_right, right))
+
+        result = sorted((-d, -i) for d, i in heap)
+        return [d for d, _ in result], [i for _, i in result]
+
+    def query(self, X_test, k=1):
+        """
+        Tìm k láng giềng gần nhất cho từng query
+
+        Parameters:
+        - X_test: ma trận query (n_queries, n_features)
+        - k: số láng giềng
+        Returns:
+        - (distances, indices): hai ma trận (n_queries, k), sắp theo khoảng cách tăng dần
+        """
+        X_test = np.asarray(X_test, dtype=float)
+        if X_test.ndim == 1:
+            X_test = X_test.reshape(-1, self.data.shape[1])
+        if not 1 <= k <= self.data.shape[0]:
+            raise ValueError(f"k={k} phải nằm trong [1, {self.data.shape[0]}]")
+        distances = np.empty((X_test.shape[0], k), dtype=float)
+        indices = np.empty((X_test.shape[0], k), dtype=int)
+        for q, x in enumerate(X_test):
+            distances[q], indices[q] = self._query_one(x, k)
+        return distances, indices
+
+
+class KDTree(_BinaryTree):
+    """KD-tree: mỗi nút lưu hộp bao (min, max) theo từng chiều"""
+
+    def __init__(self, X_train, leaf_size=16, metric='euclidean', p=2):
+        self._lo, self._hi = [], []
+        super().__init__(X_train, leaf_size, metric, p)
+
+    def _init_node(self, pts):
+        self._lo.append(pts.min(axis=0))
+        self._hi.append(pts.max(axis=0))
+
+    def _min_dist(self, node, x):
+        gap = np.maximum(0.0, np.maximum(self._lo[node] - x, x - self._hi[node]))
+        return float(_minkowski_norm(gap, self.order))
+
+
+class BallTree(_BinaryTree):
+    """Ball-tree: mỗi nút lưu tâm và bán kính, hiệu quả hơn KD-tree khi số chiều lớn"""
+
+    def __init__(self, X_train, leaf_size=16, metric='euclidean', p=2):
+        self._center, self._radius = [], []
+        super().__init__(X_train, leaf_size, metric, p)
+
+    def _init_node(self, pts):
+        center = pts.mean(axis=0)
+        self._center.append(center)
+        self._radius.append(float(np.max(_minkowski_norm(pts - center, self.order))))
+
+    def _min_dist(self, node, x):
+        # Bất đẳng thức tam giác: d(x, điểm) >= d(x, tâm) - bán kính
+        return max(0.0, float(_minkowski_norm(x - self._center[node], self.order)) - self._radius[node])
+
+
+TREE_ALGORITHMS = {'kd_tree': KDTree, 'ball_tree': BallTree}
+
+# Cây duyệt bằng Python chỉ nhanh hơn quét toàn bộ bằng numpy khi số chiều thấp và tập huấn luyện lớn:
+# với d cao gần như mọi nút đều phải thăm (d=16, n=1e4: chậm hơn quét toàn bộ ~180 lần)
+AUTO_TREE_MAX_FEATURES = 3
+AUTO_TREE_MIN_ROWS = 20_000
+
+
+def build_tree(X_train, algorithm='kd_tree', leaf_size=16, metric='euclidean', p=2):
+    """
+    Xây cây không gian một lần từ X_train để dùng lại cho nhiều lần truy vấn
+
+    Cây chỉ hiệu quả khi số chiều thấp (khoảng d <= 3 với cây duyệt bằng Python). Với d cao,
+    truy vấn phải thăm gần hết các nút và chậm hơn nhiều so với quét toàn bộ bằng numpy
+    (d=16, n=1e4: ~180 lần); khi đó dùng algorithm='brute' hoặc 'auto'.
+
+    Parameters:
+    - X_train: ma trận huấn luyện (n_train, n_features)
+    - algorithm: 'kd_tree' hoặc 'ball_tree'
+    - leaf_size: số điểm tối đa ở mỗi nút lá
+    - metric, p: khoảng cách họ Minkowski ('euclidean', 'manhattan', 'minkowski')
+    Returns:
+    - KDTree hoặc BallTree
+    """
+    if algorithm not in TREE_ALGORITHMS:
+        raise ValueError(f"algorithm phải là một trong {sorted(TREE_ALGORITHMS)}, nhận '{algorithm}'")
+    return TREE_ALGORITHMS[algorithm](X_train, leaf_size=leaf_size, metric=metric, p=p)
+
+
+def choose_algorithm(n_train, n_features, metric='euclidean'):
+    """
+    Chọn backend cho algorithm='auto' (tương tự sklearn)
+
+    Returns:
+    - 'kd_tree' khi n_features <= AUTO_TREE_MAX_FEATURES, n_train >= AUTO_TREE_MIN_ROWS và metric
+      họ Minkowski; ngược lại 'brute' (quét toàn bộ bằng numpy)
+    """
+    if metric != 'cosine' and n_features <= AUTO_TREE_MAX_FEATURES and n_train >= AUTO_TREE_MIN_ROWS:
+        return 'kd_tree'
+    return 'brute'
+
+
+# ============================================================
+# Tìm láng giềng xấp xỉ: rừng cây chiếu ngẫu nhiên (random-projection forest)
+# ============================================================
+class _RPTree:
+    """
+    Cây chiếu ngẫu nhiên: mỗi nút chia điểm theo trung vị của hình chiếu lên một
+    hướng ngẫu nhiên. Truy vấn chỉ đi xuống đúng một lá (không quay lui), nên
+    kết quả là xấp xỉ; các nút được lưu thành mảng để duyệt cả lô query cùng lúc.
+    """
+
+    def __init__(self, X_train, leaf_size, rng):
+        n, n_features = X_train.shape
+        self._dir, self._thresh, self._left, self._right, self._leaf = [], [], [], [], []
+        leaves = []
+        stack = [(np.arange(n), None, None)]
+        while stack:
+            ids, parent, side = stack.pop()
+            node = len(self._left)
+            self._dir.append(np.zeros(n_features))
+            self._thresh.append(0.0)
+            self._left.append(-1)
+            self._right.append(-1)
+            self._leaf.append(-1)
+            if parent is not None:
+                (self._left if side == 0 else self._right)[parent] = node
+
+            if len(ids) > leaf_size:
+                direction = rng.normal(size=n_features)
+                proj = X_train[ids] @ direction
+                mid = len(ids) // 2
+                order = np.argpartition(proj, mid - 1)
+                thresh = proj[order[mid - 1]]
+                # Hình chiếu trùng nhau hết (điểm trùng lặp) -> không chia được, để làm lá
+                if proj.max() > thresh:
+                    left = proj <= thresh
+                    self._dir[node] = direction
+                    self._thresh[node] = thresh
+                    stack.append((ids[~left], node, 1))
+                    stack.append((ids[left], node, 0))
+                    continue
+            self._leaf[node] = len(leaves)
+            leaves.append(ids)
+
+        self._dir = np.array(self._dir)
+        self._thresh = np.array(self._thresh)
+        self._left = np.array(self._left)
+        self._right = np.array(self._right)
+        self._leaf = np.array(self._leaf)
+        # Ma trận thành viên của các lá, đệm -1 cho lá ít điểm hơn
+        self.leaf_members = np.full((len(leaves), max(len(ids) for ids in leaves)), -1)
+        for j, ids in enumerate(leaves):
+            self.leaf_members[j, :len(ids)] = ids
+
+    def leaves_of(self, X_test):
+        """Chỉ số lá mà mỗi query rơi vào"""
+        node = np.zeros(X_test.shape[0], dtype=int)
+        while True:
+            inner = np.nonzero(self._left[node] >= 0)[0]
+            if inner.size == 0:
+                return self._leaf[node]
+            nd = node[inner]
+            proj = np.einsum('ij,ij->i', X_test[inner], self._dir[nd])
+            node[inner] = np.where(proj <= self._thresh[nd], self._left[nd], self._right[nd])
+
+
+class RPForest:
+    """
+    Chỉ mục láng giềng xấp xỉ gồm n_trees cây chiếu ngẫu nhiên
+
+    Ứng viên của một query là hợp các lá nó rơi vào trên mọi cây, sau đó được
+    xếp hạng lại bằng khoảng cách thật. n_trees là núm chỉnh recall/độ trễ:
+    nhiều cây hơn -> nhiều ứng viên hơn -> recall cao hơn nhưng chậm hơn.
+    """
+
+    def __init__(self, X_train, n_trees=8, leaf_size=32, metric='euclidean', p=2, random_state=0):
+        """
+        Parameters:
+        - X_train: ma trận huấn luyện (n_train, n_features)
+        - n_trees: số cây (núm chỉnh recall/độ trễ)
+        - leaf_size: số điểm tối đa ở mỗi lá
+        - metric, p: khoảng cách họ Minkowski dùng để xếp hạng lại ứng viên
+        - random_state: seed sinh hướng chiếu
+        """
+        self.data = np.asarray(X_train, dtype=float)
+        if self.data.ndim == 1:
+            self.data = self.data.reshape(-1, 1)
+        self.order = _minkowski_order(metric, p)
+        if self.order is None:
+            raise ValueError(f"RPForest không hỗ trợ metric '{metric}'")
+        self.metric, self.p = metric, p
+        rng = np.random.default_rng(random_state)
+        self.trees = [_RPTree(self.data, max(1, int(leaf_size)), rng) for _ in range(max(1, int(n_trees)))]
+
+    def _candidates(self, X_test):
+        """Ma trận ứng viên (n_queries, n_candidates), phần tử trùng lặp/đệm được gán -1"""
+        cand = np.concatenate([t.leaf_members[t.leaves_of(X_test)] for t in self.trees], axis=1)
+        cand.sort(axis=1)
+        cand[:, 1:][cand[:, 1:] == cand[:, :-1]] = -1
+        return cand
+
+    def query(self, X_test, k=1, max_bytes=DEFAULT_CHUNK_BYTES):
+        """
+        Tìm k láng giềng gần nhất (xấp xỉ) cho từng query
+
+        Query nào có ít hơn k ứng viên sẽ được quét toàn bộ (chính xác).
+
+        Returns:
+        - (distances, indices): hai ma trận (n_queries, k), sắp theo khoảng cách tăng dần
+        """
+        X_test = np.asarray(X_test, dtype=float)
+        if X_test.ndim == 1:
+            X_test = X_test.reshape(-1, self.data.shape[1])
+        if not 1 <= k <= self.data.shape[0]:
+            raise ValueError(f"k={k} phải nằm trong [1, {self.data.shape[0]}]")
+
+        n_queries = X_test.shape[0]
+        distances = np.empty((n_queries, k), dtype=float)
+        indices = np.empty((n_queries, k), dtype=int)
+        per_query = sum(t.leaf_members.shape[1] for t in self.trees) * self.data.shape[1] * 8
+        chunk_size = max(1, int(max_bytes // max(1, per_query)))
+        for start in range(0, n_queries, chunk_size):
+            Q = X_test[start:start + chunk_size]
+            cand = self._candidates(Q)
+            valid = cand >= 0
+            dist = _minkowski_norm(self.data[np.where(valid, cand, 0)] - Q[:, None, :], self.order)
+            dist[~valid] = np.inf
+
+            short = valid.sum(axis=1) < k
+            if short.any():
+                # Không đủ ứng viên: quét toàn bộ cho các query này
+                engine = DistanceEngine(self.data, metric=self.metric, p=self.p)
+                d_full, i_full = _brute_kneighbors(engine, Q[short], k)
+
+            if cand.shape[1] >= k:
+                pos = _topk_indices(dist, k)
+                indices[start:start + len(Q)] = np.take_along_axis(cand, pos, axis=1)
+                distances[start:start + len(Q)] = np.take_along_axis(dist, pos, axis=1)
+            if short.any():
+                rows = start + np.nonzero(short)[0]
+                indices[rows], distances[rows] = i_full, d_full
+        return distances, indices
+
+
+def recall_at_k(approx_indices, exact_indices):
+    """
+    Recall trung bình: tỉ lệ láng giềng đúng (exact) có mặt trong kết quả xấp xỉ
+
+    Parameters:
+    - approx_indices, exact_indices: ma trận chỉ số (n_queries, k)
+    Returns:
+    - Recall trong khoảng [0, 1]
+    """
+    approx_indices = np.asarray(approx_indices)
+    exact_indices = np.asarray(exact_indices)
+    hits = (exact_indices[:, :, None] == approx_indices[:, None, :]).any(axis=2)
+    return float(hits.mean())
+
+
+def _predict_from_neighbors(y_neighbors, dist_neighbors, ks, weights='uniform'):
+    """
+    Dự đoán cho mọi k trong ks từ danh sách láng giềng đã sắp xếp tới k_max
+
+    Dùng tổng tích lũy theo thứ tự láng giềng nên mỗi k chỉ tốn O(n_queries).
+
+    Parameters:
+    - y_neighbors: y của láng giềng (n_queries, k_max), sắp theo khoảng cách tăng dần
+    - dist_neighbors: khoảng cách tương ứng (n_queries, k_max)
+    - ks: danh sách các giá trị k (<= k_max)
+    - weights: 'uniform' hoặc 'distance'
+    Returns:
+    - dict {k: mảng dự đoán (n_queries,)}
+    """
+    if weights not in WEIGHTS:
+        raise ValueError(f"weights phải là một trong {WEIGHTS}, nhận '{weights}'")
+    # prefix[:, j] = tổng y của j+1 láng giềng gần nhất
+    prefix = np.cumsum(y_neighbors, axis=1)
+    if weights == 'uniform':
+        return {k: prefix[:, k - 1] / k for k in ks}
+
+    # Trọng số 1/d: các láng giềng d = 0 luôn đứng đầu danh sách đã sắp xếp
+    zero = dist_neighbors == 0
+    n_zero = zero.sum(axis=1)
+    w = np.where(zero, 0.0, 1.0 / np.where(zero, 1.0, dist_neighbors))
+    prefix_w = np.cumsum(w, axis=1)
+    prefix_wy = np.cumsum(w * y_neighbors, axis=1)
+    rows = np.arange(y_neighbors.shape[0])
+    result = {}
+    for k in ks:
+        z = np.minimum(n_zero, k)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            exact = prefix[rows, np.maximum(z - 1, 0)] / np.maximum(z, 1)
+            weighted = prefix_wy[:, k - 1] / prefix_w[:, k - 1]
+        result[k] = np.where(z > 0, exact, weighted)
+    return result
+
+
+class KNNRegressor:
+    """
+    Mô hình KNN hồi quy có trạng thái (fit một lần, dự đoán nhiều lần)
+
+    Láng giềng của mỗi query được sắp xếp một lần tới k_max, sau đó dự đoán cho
+    mọi k <= k_max được lấy từ tổng tích lũy (prefix sum) của y theo thứ tự láng
+    giềng, nên quét nhiều giá trị k chỉ tốn một lần tìm láng giềng.
+    """
+
+    def __init__(self, n_neighbors=3, algorithm='brute', leaf_size=16, chunk_size=None,
+                 metric='euclidean', p=2, weights='uniform', n_trees=8, random_state=0):
+        """
+        Parameters:
+        - n_neighbors: số láng giềng mặc định khi dự đoán
+        - algorithm: 'brute', 'kd_tree', 'ball_tree', 'rp_forest' (xấp xỉ) hoặc 'auto'
+          (choose_algorithm: cây chỉ khi ít chiều và nhiều dữ liệu, ngược lại 'brute')
+        - leaf_size: số điểm tối đa ở nút lá (chỉ dùng cho cây)
+        - chunk_size: số query mỗi lô khi quét toàn bộ (None = tự tính)
+        - metric, p: khoảng cách sử dụng (xem DistanceEngine)
+        - weights: 'uniform' hoặc 'distance' (trọng số nghịch đảo khoảng cách)
+        - n_trees: số cây của RPForest (núm chỉnh recall/độ trễ, chỉ dùng cho 'rp_forest')
+        - random_state: seed của RPForest
+        """
+        self.n_neighbors = n_neighbors
+        self.algorithm = algorithm
+        self.leaf_size = leaf_size
+        self.chunk_size = chunk_size
+        self.metric = metric
+        self.p = p
+        self.weights = weights
+        self.n_trees = n_trees
+        self.random_state = random_state
+        self.X_train_ = None
+        self.y_train_ = None
+        self.algorithm_ = None
+        self.tree_ = None
+        self.engine_ = None
+
+    def fit(self, X_train, y_train):
+        """
+        Lưu dữ liệu huấn luyện và xây cây (nếu dùng)
+
+        Returns:
+        - self
+        """
+        X_train = np.asarray(X_train, dtype=float)
+        if X_train.ndim == 1:
+            X_train = X_train.reshape(-1, 1)
+        y_train = np.asarray(y_train, dtype=float)
+        if X_train.shape[0] != y_train.shape[0]:
+            raise ValueError(f"X_train có {X_train.shape[0]} dòng, y_train có {y_train.shape[0]}")
+        if self.algorithm not in ('brute', 'rp_forest', 'auto') and self.algorithm not in TREE_ALGORITHMS:
+            raise ValueError(f"algorithm không hợp lệ: '{self.algorithm}'")
+        if self.weights not in WEIGHTS:
+            raise ValueError(f"weights phải là một trong {WEIGHTS}, nhận '{self.weights}'")
+
+        self.X_train_ = X_train
+        self.y_train_ = y_train
+        self.tree_ = None
+        self.engine_ = None
+        self.algorithm_ = self.algorithm
+        if self.algorithm == 'auto':
+            self.algorithm_ = choose_algorithm(X_train.shape[0], X_train.shape[1], self.metric)
+        if self.algorithm_ == 'rp_forest':
+            self.tree_ = RPForest(X_train, n_trees=self.n_trees, leaf_size=max(self.leaf_size, 2 * self.n_neighbors),
+                                  metric=self.metric, p=self.p, random_state=self.random_state)
+        elif self.algorithm_ != 'brute':
+            self.tree_ = build_tree(X_train, algorithm=self.algorithm_, leaf_size=self.leaf_size,
+                                    metric=self.metric, p=self.p)
+        else:
+            self.engine_ = DistanceEngine(X_train, metric=self.metric, p=self.p)
+        return self
+
+    def _check_X(self, X_test):
+        if self.X_train_ is None:
+            raise RuntimeError("Mô hình chưa được fit")
+        X_test = np.asarray(X_test, dtype=float)
+        if X_test.ndim == 1:
+            X_test = X_test.reshape(-1, self.X_train_.shape[1])
+        if X_test.shape[1] != self.X_train_.shape[1]:
+            raise ValueError(f"X_test có {X_test.shape[1]} đặc trưng, X_train có {self.X_train_.shape[1]}")
+        return X_test
+
+    def kneighbors(self, X_test, n_neighbors=None, return_distance=True):
+        """
+        Tìm láng giềng gần nhất, sắp theo khoảng cách tăng dần
+
+        Parameters:
+        - X_test: ma trận query (n_queries, n_features)
+        - n_neighbors: số láng giềng (None = self.n_neighbors)
+        - return_distance: True = trả về cả khoảng cách
+        Returns:
+        - (distances, indices) hoặc chỉ indices, kích thước (n_queries, n_neighbors)
+        """
+        X_test = self._check_X(X_test)
+        k = self.n_neighbors if n_neighbors is None else n_neighbors
+        if not 1 <= k <= self.X_train_.shape[0]:
+            raise ValueError(f"k={k} phải nằm trong [1, {self.X_train_.shape[0]}]")
+
+        if self.tree_ is not None:
+            dist, idx = self.tree_.query(X_test, k=k)
+        else:
+            dist, idx = _brute_kneighbors(self.engine_, X_test, k, self.chunk_size)
+        return (dist, idx) if return_distance else idx
+
+    def predict_k_range(self, X_test, ks):
+        """
+        Dự đoán cho nhiều giá trị k chỉ với một lần tìm láng giềng
+
+        Parameters:
+        - X_test: ma trận query (n_queries, n_features)
+        - ks: danh sách các giá trị k
+        Returns:
+        - dict {k: mảng dự đoán (n_queries,)}
+        """
+        ks = list(ks)
+        dist, idx = self.kneighbors(X_test, n_neighbors=max(ks))
+        return _predict_from_neighbors(self.y_train_[idx], dist, ks, self.weights)
+
+    def predict(self, X_test, k=None):
+        """
+        Dự đoán giá trị = trung bình y của k láng giềng gần nhất
+
+        Parameters:
+        - X_test: ma trận query (n_queries, n_features)
+        - k: số láng giềng (None = self.n_neighbors)
+        Returns:
+        - Mảng giá trị dự đoán (n_queries,)
+        """
+        k = self.n_neighbors if k is None else k
+        return self.predict_k_range(X_test, [k])[k]
+
+
+# ============================================================
+# Tìm siêu tham số bằng k-fold cross-validation (song song)
+# ============================================================
+# Dữ liệu dùng chung trong mỗi process con, gán một lần qua initializer
+_CV_DATA = {}
+
+
+def _cv_init_worker(X_all, y_all):
+    _CV_DATA['X'] = X_all
+    _CV_DATA['y'] = y_all
+
+
+def _cv_fold_job(train_idx, val_idx, fold, metric, p, k_values, weights_list):
+    """
+    Một công việc = (fold, metric): tìm láng giềng một lần tới k_max rồi chấm điểm
+    mọi tổ hợp (weights, k) từ cùng thứ tự láng giềng đó
+    """
+    start = time.perf_counter()
+    X_all, y_all = _CV_DATA['X'], _CV_DATA['y']
+    model = KNNRegressor(metric=metric, p=p).fit(X_all[train_idx], y_all[train_idx])
+    dist, idx = model.kneighbors(X_all[val_idx], n_neighbors=max(k_values))
+    y_nb = model.y_train_[idx]
+    y_val = y_all[val_idx]
+
+    scores = {}
+    for weights in weights_list:
+        preds = _predict_from_neighbors(y_nb, dist, k_values, weights)
+        for k in k_values:
+            scores[(weights, k)] = float(np.mean((preds[k] - y_val) ** 2))
+    return fold, metric, scores, time.perf_counter() - start
+
+
+def knn_grid_search_cv(X_all, y_all, k_values=(1, 3, 5, 7), metrics=('euclidean', 'manhattan'),
+                       weights=('uniform', 'distance'), p=2, n_folds=5, n_jobs=None, random_state=0):
+    """
+    Tìm (k, metric, weights) tốt nhất theo MSE trung bình của k-fold cross-validation
+
+    Mỗi (fold, metric) là một công việc chạy trên ProcessPoolExecutor; dữ liệu
+    được gửi sang mỗi process một lần qua initializer thay vì theo từng công việc.
+
+    Parameters:
+    - X_all, y_all: toàn bộ dữ liệu
+    - k_values: các giá trị k cần thử
+    - metrics: các metric cần thử (xem METRICS)
+    - weights: các kiểu trọng số cần thử (xem WEIGHTS)
+    - p: bậc Minkowski khi metric='minkowski'
+    - n_folds: số fold
+    - n_jobs: số process (None = tất cả CPU, 1 = chạy tuần tự)
+    - random_state: seed để xáo trộn dữ liệu trước khi chia fold
+    Returns:
+    - dict gồm best_params, best_score, results (điểm từng cấu hình),
+      fold_times (thời gian từng fold theo metric) và total_time
+    """
+    X_all = np.asarray(X_all, dtype=float)
+    if X_all.ndim == 1:
+        X_all = X_all.reshape(-1, 1)
+    y_all = np.asarray(y_all, dtype=float)
+    n = X_all.shape[0]
+    if not 2 <= n_folds <= n:
+        raise ValueError(f"n_folds={n_folds} phải nằm trong [2, {n}]")
+    k_values = sorted(set(k_values))
+    folds = np.array_split(np.random.default_rng(random_state).permutation(n), n_folds)
+    min_train = n - max(len(f) for f in folds)
+    if k_values[0] < 1 or k_values[-1] > min_train:
+        raise ValueError(f"k phải nằm trong [1, {min_train}] (số điểm train nhỏ nhất của một fold)")
+    for weight in weights:
+        if weight not in WEIGHTS:
+            raise ValueError(f"weights phải là một trong {WEIGHTS}, nhận '{weight}'")
+
+    jobs = []
+    for fold, val_idx in enumerate(folds):
+        train_idx = np.concatenate([f for j, f in enumerate(folds) if j != fold])
+        for metric in metrics:
+            jobs.append((train_idx, val_idx, fold, metric, p, k_values, tuple(weights)))
+
+    start = time.perf_counter()
+    if n_jobs == 1:
+        _cv_init_worker(X_all, y_all)
+        outputs = [_cv_fold_job(*job) for job in jobs]
+    else:
+        workers = min(n_jobs or os.cpu_count() or 1, len(jobs))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_cv_init_worker,
+                                 initargs=(X_all, y_all)) as pool:
+            outputs = list(pool.map(_cv_fold_job, *zip(*jobs)))
+    total_time = time.perf_counter() - start
+
+    fold_scores = {}
+    fold_times = {metric: [0.0] * n_folds for metric in metrics}
+    for fold, metric, scores, elapsed in outputs:
+        fold_times[metric][fold] = elapsed
+        for (weight, k), score in scores.items():
+            fold_scores.setdefault((k, metric, weight), [0.0] * n_folds)[fold] = score
+
+    results = []
+    for (k, metric, weight), scores in fold_scores.items():
+        results.append({
+            'k': k, 'metric': metric, 'weights': weight,
+            'mean_mse': float(np.mean(scores)), 'std_mse': float(np.std(scores)),
+            'fold_mse': scores,
+        })
+    results.sort(key=lambda r: (r['mean_mse'], r['k']))
+    best = results[0]
+    return {
+        'best_params': {'k': best['k'], 'metric': best['metric'], 'weights': best['weights']},
+        'best_score': best['mean_mse'],
+        'results': results,
+        'fold_times': fold_times,
+        'total_time': total_time,
+    }
+
+
+# ============================================================
+# KNN ngoài bộ nhớ (out-of-core): đọc dữ liệu huấn luyện theo khối từ file
+# ============================================================
+def _open_array(source):
+    """Mở file .npy dạng memory-map (chỉ đọc); mảng/np.memmap được giữ nguyên, không sao chép"""
+    if isinstance(source, (str, os.PathLike)):
+        return np.load(source, mmap_mode='r')
+    return source
+
+
+def kneighbors_streaming(X_train, X_test, k=3, metric='euclidean', p=2, chunk_rows=None,
+                         max_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Tìm k láng giềng gần nhất khi X_train lớn hơn RAM
+
+    X_train được đọc lần lượt từng khối chunk_rows dòng (một lần duy nhất). Mỗi
+    query giữ top-k tạm thời (best_dist, best_idx); sau mỗi khối, top-k cũ được
+    gộp với khoảng cách tới khối mới và chọn lại bằng argpartition. Bộ nhớ đỉnh
+    không phụ thuộc số dòng huấn luyện: khối train chiếm tối đa max_bytes/4, mỗi
+    lô query tạo cùng lúc tối đa 3 mảng (khoảng cách, bản gộp, kết quả
+    argpartition) mỗi mảng ~max_bytes/6, cộng thêm kết quả (n_queries, k) và X_test.
+
+    Parameters:
+    - X_train: đường dẫn file .npy, np.memmap hoặc mảng (n_train, n_features)
+    - X_test: ma trận query (n_queries, n_features)
+    - k: số láng giềng
+    - metric, p: khoảng cách sử dụng (xem DistanceEngine)
+    - chunk_rows: số dòng huấn luyện mỗi khối (None = tự tính theo max_bytes)
+    - max_bytes: giới hạn bộ nhớ cho mảng trung gian
+    Returns:
+    - (distances, indices): hai ma trận (n_queries, k), chỉ số là dòng trong X_train
+    """
+    X_train = _open_array(X_train)
+    X_test = np.asarray(X_test, dtype=float)
+    if X_test.ndim == 1:
+        X_test = X_test.reshape(-1, X_train.shape[1])
+    n_train, n_features = X_train.shape
+    if X_test.shape[1] != n_features:
+        raise ValueError(f"X_test có {X_test.shape[1]} đặc trưng, X_train có {n_features}")
+    if not 1 <= k <= n_train:
+        raise ValueError(f"k={k} phải nằm trong [1, {n_train}]")
+    if chunk_rows is None:
+        # Khối đọc từ đĩa (bản float64) chiếm tối đa 1/4 ngân sách bộ nhớ
+        chunk_rows = max(k, int(max_bytes // (4 * 8 * n_features)))
+
+    n_queries = X_test.shape[0]
+    best_dist = np.full((n_queries, k), np.inf)
+    best_idx = np.full((n_queries, k), -1)
+    for offset in range(0, n_train, chunk_rows):
+        chunk = np.asarray(X_train[offset:offset + chunk_rows], dtype=float)
+        engine = DistanceEngine(chunk, metric=metric, p=p)
+        query_block = engine.chunk_rows(max_bytes // 6)
+        for start in range(0, n_queries, query_block):
+            rows = slice(start, start + query_block)
+            block = engine.pairwise(X_test[rows])
+            # Top-k hiện tại đứng trước khối mới: khi hòa khoảng cách vẫn ưu tiên chỉ số nhỏ hơn
+            merged_dist = np.empty((block.shape[0], k + block.shape[1]))
+            merged_dist[:, :k] = best_dist[rows]
+            merged_dist[:, k:] = block
+            del block
+            pos = _topk_indices(merged_dist, k)
+            # pos < k: láng giềng cũ; pos >= k: dòng offset + (pos - k) của khối mới (không dựng mảng chỉ số gộp)
+            old_idx = np.take_along_axis(best_idx[rows], np.minimum(pos, k - 1), axis=1)
+            best_dist[rows] = np.take_along_axis(merged_dist, pos, axis=1)
+            best_idx[rows] = np.where(pos < k, old_idx, offset + pos - k)
+    return best_dist, best_idx
+
+
+def knn_predict_streaming(X_train, y_train, X_test, k=3, metric='euclidean', p=2, weights='uniform',
+                          chunk_rows=None, max_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Dự đoán KNN với dữ liệu huấn luyện đọc theo khối từ file .npy / np.memmap
+
+    Parameters:
+    - X_train, y_train: đường dẫn file .npy, np.memmap hoặc mảng
+    - các tham số còn lại: xem kneighbors_streaming và knn_predict_batch
+    Returns:
+    - Mảng giá trị dự đoán (n_queries,)
+    """
+    dist, idx = kneighbors_streaming(X_train, X_test, k=k, metric=metric, p=p,
+                                     chunk_rows=chunk_rows, max_bytes=max_bytes)
+    y_train = _open_array(y_train)
+    # Chỉ đọc các giá trị y của láng giềng được chọn (fancy-index trên memmap)
+    order = np.argsort(idx, axis=None)
+    y_nb = np.empty(idx.size, dtype=float)
+    y_nb[order] = y_train[idx.ravel()[order]]
+    return _weighted_mean(y_nb.reshape(idx.shape), dist, weights)
+
+
+def main():
+    print("=" * 60)
+    print("BÀI TẬP KNN - DỰ ĐOÁN LƯƠNG THEO KINH NGHIỆM")
+    print("=" * 60)
+
+    print("\n" + "=" * 60)
+    print("CÂU 1: SỬ DỤNG HÀM TỰ CÀI ĐẶT knn_predictor")
+    print("=" * 60)
+
+    # In chi tiết với ASCII đơn giản (use_unicode=False để tránh lệch trên Windows)
+    predicted_salary_custom = knn_predictor(X, y, test_experience, k=k_value, verbose=True)
+    print(f"\nDự đoán salary với experience = {test_experience} (k={k_value}):")
+    print(f"Salary dự đoán = {predicted_salary_custom:.2f}")
+
+    # Câu 2: So sánh với sklearn
+    print("\n" + "=" * 60)
+    print("CÂU 2: SO SÁNH VỚI THƯ VIỆN SKLEARN")
+    print("=" * 60)
+
+    # Tạo mô hình KNN với sklearn
+    knn_sklearn = KNeighborsRegressor(n_neighbors=k_value)
+    knn_sklearn.fit(X, y)
+
+    # Dự đoán với sklearn
+    X_test = np.array([[test_experience]])
+    predicted_salary_sklearn = knn_sklearn.predict(X_test)[0]
+
+    print(f"\nDự đoán salary với experience = {test_experience} (k={k_value}):")
+    print(f"Salary dự đoán (sklearn) = {predicted_salary_sklearn:.2f}")
+
+    # Tìm k láng giềng gần nhất từ sklearn
+    distances_sklearn, indices_sklearn = knn_sklearn.kneighbors(X_test)
+
+    neighbors_sklearn = [(X[idx][0], y[idx], dist) for idx, dist in zip(indices_sklearn[0], distances_sklearn[0])]
+    print_neighbors_table(neighbors_sklearn, f"{k_value} láng giềng gần nhất (theo sklearn)")
+
+    # So sánh kết quả
+    print("\n" + "=" * 60)
+    print("SO SÁNH KẾT QUẢ")
+    print("=" * 60)
+    print(f"Dự đoán từ hàm tự cài đặt: {predicted_salary_custom:.2f}")
+    print(f"Dự đoán từ sklearn:         {predicted_salary_sklearn:.2f}")
+
+    if abs(predicted_salary_custom - predicted_salary_sklearn) < 0.001:
+        print("\n✓ Kết quả KHỚP HOÀN TOÀN! Hàm tự cài đặt chính xác.")
+    else:
+        print("\n✗ Có sự khác biệt nhỏ giữa hai phương pháp.")
+
+    # Thử nghiệm với các giá trị k khác nhau
+    print("\n" + "=" * 60)
+    print("THỰC NGHIỆM VỚI CÁC GIÁ TRỊ K KHÁC NHAU")
+    print("=" * 60)
+    print("┌─────────────────┬─────────────────┬─────────────────┐")
+    print("│       K         │   KNN (custom)  │   KNN (sklearn) │")
+    print("├─────────────────┼─────────────────┼─────────────────┤")
+
+    # Tìm láng giềng một lần tới k_max rồi lấy dự đoán cho mọi k từ prefix sum
+    k_list = [1, 3, 5, 7]
+    preds_custom = KNNRegressor(n_neighbors=max(k_list)).fit(X, y).predict_k_range(X_test, k_list)
+    # sklearn: fit một lần, chỉ đổi n_neighbors khi dự đoán
+    knn_temp = KNeighborsRegressor(n_neighbors=max(k_list)).fit(X, y)
+
+    for k in k_list:
+        pred_custom = preds_custom[k][0]
+        pred_sklearn = knn_temp.set_params(n_neighbors=k).predict(X_test)[0]
+        print(f"│ {k:^15.1f} │ {pred_custom:^15.1f} │ {pred_sklearn:^15.1f} │")
+
+    print("└─────────────────┴─────────────────┴─────────────────┘")
+
+    # Câu 3: Dự đoán theo lô (vectorized) và đối chiếu với hàm gốc
+    print("\n" + "=" * 60)
+    print("DỰ ĐOÁN THEO LÔ (knn_predict_batch) - ĐỐI CHIẾU VỚI knn_predictor")
+    print("=" * 60)
+    queries = np.round(np.arange(0.5, 8.01, 0.1), 2)
+    for k in [1, 3, 5, 7]:
+        pred_loop = np.array([knn_predictor(X, y, q, k=k, verbose=False) for q in queries])
+        pred_batch = knn_predict_batch(X, y, queries.reshape(-1, 1), k=k)
+        status = "KHỚP" if np.allclose(pred_loop, pred_batch) else "KHÁC"
+        print(f"k={k}: {len(queries)} query, sai khác lớn nhất = {np.max(np.abs(pred_loop - pred_batch)):.6f} → {status}")
+
+
+    # Câu 4: Cây không gian (KD-tree / Ball-tree) - đối chiếu với sklearn
+    print("\n" + "=" * 60)
+    print("CÂY KHÔNG GIAN (KD-TREE / BALL-TREE) - ĐỐI CHIẾU VỚI SKLEARN")
+    print("=" * 60)
+    for algorithm in ['kd_tree', 'ball_tree']:
+        tree = build_tree(X, algorithm=algorithm, leaf_size=2)
+        for k in [1, 3, 5, 7]:
+            pred_tree = np.array([knn_predictor(X, y, q, k=k, verbose=False, tree=tree) for q in queries])
+            knn_temp = KNeighborsRegressor(n_neighbors=k, algorithm=algorithm)
+            knn_temp.fit(X, y)
+            pred_sklearn = knn_temp.predict(queries.reshape(-1, 1))
+            status = "KHỚP" if np.allclose(pred_tree, pred_sklearn) else "KHÁC"
+            print(f"{algorithm:<9} k={k}: sai khác lớn nhất so với sklearn = {np.max(np.abs(pred_tree - pred_sklearn)):.6f} → {status}")
+
+
+    # Câu 5: Các metric khoảng cách và trọng số - đối chiếu với sklearn
+    print("\n" + "=" * 60)
+    print("METRIC KHOẢNG CÁCH VÀ TRỌNG SỐ - ĐỐI CHIẾU VỚI SKLEARN")
+    print("=" * 60)
+    for metric, p in [('euclidean', 2), ('manhattan', 2), ('minkowski', 3)]:
+        for weights in ['uniform', 'distance']:
+            model = KNNRegressor(n_neighbors=k_value, metric=metric, p=p, weights=weights).fit(X, y)
+            pred_custom = model.predict(queries.reshape(-1, 1))
+            knn_temp = KNeighborsRegressor(n_neighbors=k_value, metric=metric, p=p, weights=weights).fit(X, y)
+            pred_sklearn = knn_temp.predict(queries.reshape(-1, 1))
+            status = "KHỚP" if np.allclose(pred_custom, pred_sklearn) else "KHÁC"
+            print(f"{metric:<9} (p={p}) weights={weights:<8}: → {status}")
+
+
+    # Câu 6: Chọn siêu tham số bằng cross-validation song song
+    print("\n" + "=" * 60)
+    print("CHỌN (K, METRIC, WEIGHTS) BẰNG CROSS-VALIDATION SONG SONG")
+    print("=" * 60)
+    search = knn_grid_search_cv(X, y, k_values=[1, 3, 5, 7], metrics=('euclidean', 'manhattan'),
+                                weights=('uniform', 'distance'), n_folds=7, random_state=42)
+    for r in search['results'][:5]:
+        print(f"k={r['k']}, metric={r['metric']:<9}, weights={r['weights']:<8}: "
+              f"MSE = {r['mean_mse']:.2f} ± {r['std_mse']:.2f}")
+    print(f"→ Cấu hình tốt nhất: {search['best_params']} (MSE = {search['best_score']:.2f})")
+    for metric, times in search['fold_times'].items():
+        print(f"  Thời gian từng fold ({metric}): " + ", ".join(f"{t * 1000:.1f}ms" for t in times))
+    print(f"  Tổng thời gian: {search['total_time']:.3f}s")
+
+
+    # Câu 7: Tìm láng giềng xấp xỉ (RPForest) - đánh đổi recall và độ trễ
+    print("\n" + "=" * 60)
+    print("LÁNG GIỀNG XẤP XỈ (RANDOM-PROJECTION FOREST) - RECALL VS ĐỘ TRỄ")
+    print("=" * 60)
+    rng = np.random.default_rng(0)
+    X_big = rng.normal(size=(50000, 8))
+    Q_big = rng.normal(size=(2000, 8))
+    start = time.perf_counter()
+    _, exact_idx = KNNRegressor(n_neighbors=10).fit(X_big, np.zeros(len(X_big))).kneighbors(Q_big)
+    brute_time = time.perf_counter() - start
+    print(f"Quét toàn bộ (chính xác): {brute_time * 1000:8.1f}ms, recall = 1.000")
+    for n_trees in [1, 2, 4, 8, 16]:
+        forest = RPForest(X_big, n_trees=n_trees, leaf_size=32)
+        start = time.perf_counter()
+        _, approx_idx = forest.query(Q_big, k=10)
+        elapsed = time.perf_counter() - start
+        print(f"RPForest n_trees={n_trees:<2}:     {elapsed * 1000:8.1f}ms, "
+              f"recall = {recall_at_k(approx_idx, exact_idx):.3f}")
+
+
+    # Câu 8: KNN ngoài bộ nhớ - dữ liệu huấn luyện nằm trong file .npy (memory-map)
+    print("\n" + "=" * 60)
+    print("KNN NGOÀI BỘ NHỚ (MEMORY-MAPPED .NPY) - BỘ NHỚ ĐỈNH GIỚI HẠN")
+    print("=" * 60)
+    import tempfile
+    import tracemalloc
+    with tempfile.TemporaryDirectory() as tmp:
+        x_path, y_path = os.path.join(tmp, 'X_train.npy'), os.path.join(tmp, 'y_train.npy')
+        n_rows = 400000
+        X_file = np.lib.format.open_memmap(x_path, mode='w+', dtype=np.float64, shape=(n_rows, 8))
+        y_file = np.lib.format.open_memmap(y_path, mode='w+', dtype=np.float64, shape=(n_rows,))
+        for offset in range(0, n_rows, 100000):
+            X_file[offset:offset + 100000] = rng.normal(size=(100000, 8))
+            y_file[offset:offset + 100000] = X_file[offset:offset + 100000].sum(axis=1)
+        X_file.flush()
+        y_file.flush()
+        del X_file, y_file
+
+        Q_small = Q_big[:200]
+        tracemalloc.start()
+        pred_stream = knn_predict_streaming(x_path, y_path, Q_small, k=5, max_bytes=8 * 1024 * 1024)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        pred_memory = knn_predict_batch(np.load(x_path), np.load(y_path), Q_small, k=5)
+        status = "KHỚP" if np.allclose(pred_stream, pred_memory) else "KHÁC"
+        print(f"{n_rows} dòng huấn luyện ({os.path.getsize(x_path) / 2 ** 20:.0f}MB trên đĩa), "
+              f"bộ nhớ đỉnh khi chạy streaming = {peak / 2 ** 20:.1f}MB → {status} với bản trong RAM")
 
-print("└─────────────────┴─────────────────┴─────────────────┘")
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+'''
+Benchmark các backend KNN tự cài đặt (KNN_BT04.py) so với sklearn.
+
+Sinh dữ liệu tổng hợp với số dòng từ 1e2 đến 1e6 và số đặc trưng từ 1 đến 64,
+đo thời gian fit, thời gian predict, throughput (query/giây) và bộ nhớ đỉnh
+cho từng backend: loop (knn_predictor), vectorized (knn_predict_batch),
+kd_tree, ball_tree và sklearn. Kết quả được ghi ra file JSON hoặc CSV để theo
+dõi hồi quy hiệu năng giữa các lần chạy (--compare).
+
+Ví dụ:
+    python KNN_benchmark.py --output bench_results.json
+    python KNN_benchmark.py --sizes 100 1000 --features 1 8 --output quick.csv
+    python KNN_benchmark.py --output new.json --compare bench_results.json
+'''
+import argparse
+import csv
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import sklearn
+from sklearn.neighbors import KNeighborsRegressor
+
+from KNN_BT04 import KNNRegressor, knn_predict_batch, knn_predictor
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000, 1000000]
+DEFAULT_FEATURES = [1, 2, 8, 16, 64]
+BACKENDS = ['loop', 'vectorized', 'kd_tree', 'ball_tree', 'sklearn']
+
+# Giới hạn khối lượng công việc để các backend chạy bằng vòng lặp Python không mất hàng giờ
+# (mỗi trường hợp chạy repeat + 1 lần). Truy vấn cây tăng rất nhanh theo số chiều: n=1e5, d=16 mất
+# ~30s cho 200 query so với 0.5s của brute-force, nên cây bị giới hạn theo cả d lẫn n_train * d.
+MAX_LOOP_WORK = 2_000_000       # n_train * n_queries (loại trừ) cho backend loop
+MAX_TREE_FEATURES = 8           # số đặc trưng tối đa cho kd_tree / ball_tree
+MAX_TREE_WORK = 200_000         # n_train * n_features (loại trừ) cho kd_tree / ball_tree
+
+CSV_FIELDS = ['backend', 'n_train', 'n_features', 'n_queries', 'k', 'status',
+              'fit_s', 'predict_s', 'queries_per_s', 'peak_mb', 'note']
+
+
+def make_dataset(n_train, n_features, n_queries, seed):
+    """Sinh dữ liệu hồi quy tổng hợp: y = tổng có trọng số của đặc trưng + nhiễu"""
+    rng = np.random.default_rng(seed)
+    X_train = rng.normal(size=(n_train, n_features))
+    coef = rng.normal(size=n_features)
+    y_train = X_train @ coef + 0.1 * rng.normal(size=n_train)
+    X_test = rng.normal(size=(n_queries, n_features))
+    return X_train, y_train, X_test
+
+
+def _make_runner(backend, X_train, y_train, X_test, k):
+    """Trả về (fit, predict): fit() trả về trạng thái đã fit, predict(state) trả về dự đoán"""
+    if backend == 'loop':
+        return (lambda: None,
+                lambda _: np.array([knn_predictor(X_train, y_train, x, k=k, verbose=False) for x in X_test]))
+    if backend == 'vectorized':
+        return (lambda: None,
+                lambda _: knn_predict_batch(X_train, y_train, X_test, k=k))
+    if backend in ('kd_tree', 'ball_tree'):
+        return (lambda: KNNRegressor(n_neighbors=k, algorithm=backend).fit(X_train, y_train),
+                lambda model: model.predict(X_test))
+    if backend == 'sklearn':
+        return (lambda: KNeighborsRegressor(n_neighbors=k).fit(X_train, y_train),
+                lambda model: model.predict(X_test))
+    raise ValueError(f"backend không hợp lệ: '{backend}'")
+
+
+def _skip_reason(backend, n_train, n_features, n_queries, k):
+    if k > n_train:
+        return "k > n_train"
+    if backend == 'loop' and n_train * n_queries >= MAX_LOOP_WORK:
+        return f"n_train*n_queries >= {MAX_LOOP_WORK}"
+    if backend in ('kd_tree', 'ball_tree'):
+        if n_features > MAX_TREE_FEATURES:
+            return f"n_features > {MAX_TREE_FEATURES}"
+        if n_train * n_features >= MAX_TREE_WORK:
+            return f"n_train*n_features >= {MAX_TREE_WORK}"
+    return None
+
+
+def positive_int(value):
+    """Kiểu argparse: số nguyên >= 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"phải là số nguyên >= 1, nhận được {value}")
+    return number
+
+
+def run_case(backend, X_train, y_train, X_test, k, repeat, reference=None):
+    """
+    Đo một backend trên một bộ dữ liệu
+
+    Thời gian lấy giá trị nhỏ nhất trong `repeat` lần chạy; bộ nhớ đỉnh được đo ở
+    một lần chạy riêng với tracemalloc (để không làm sai lệch thời gian).
+    """
+    fit, predict = _make_runner(backend, X_train, y_train, X_test, k)
+    repeat = max(1, repeat)
+    fit_times, predict_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        state = fit()
+        fit_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        preds = predict(state)
+        predict_times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    predict(fit())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    note = ''
+    if reference is not None and not np.allclose(preds, reference):
+        note = 'kết quả khác backend tham chiếu'
+    predict_s = min(predict_times)
+    return {
+        'status': 'ok',
+        'fit_s': min(fit_times),
+        'predict_s': predict_s,
+        'queries_per_s': X_test.shape[0] / predict_s if predict_s > 0 else float('inf'),
+        'peak_mb': peak / 2 ** 20,
+        'note': note,
+    }, preds
+
+
+def run_benchmark(sizes, features, backends, n_queries=200, k=5, repeat=3, seed=0, log=print):
+    """
+    Chạy toàn bộ lưới (n_train, n_features, backend)
+
+    Returns:
+    - Danh sách kết quả, mỗi phần tử là một dict với các khóa CSV_FIELDS
+    """
+    results = []
+    for n_train in sizes:
+        for n_features in features:
+            X_train, y_train, X_test = make_dataset(n_train, n_features, n_queries, seed)
+            reference = None
+            for backend in backends:
+                row = {'backend': backend, 'n_train': n_train, 'n_features': n_features,
+                       'n_queries': n_queries, 'k': k}
+                reason = _skip_reason(backend, n_train, n_features, n_queries, k)
+                if reason:
+                    row.update(status='skipped', fit_s=None, predict_s=None, queries_per_s=None,
+                               peak_mb=None, note=reason)
+                else:
+                    metrics, preds = run_case(backend, X_train, y_train, X_test, k, repeat, reference)
+                    row.update(metrics)
+                    if reference is None:
+                        reference = preds
+                results.append(row)
+                log(_format_row(row))
+    return results
+
+
+def _format_row(row):
+    if row['status'] != 'ok':
+        return (f"{row['backend']:<10} n={row['n_train']:>8} d={row['n_features']:>3}  "
+                f"bỏ qua ({row['note']})")
+    return (f"{row['backend']:<10} n={row['n_train']:>8} d={row['n_features']:>3}  "
+            f"fit={row['fit_s'] * 1000:9.2f}ms  predict={row['predict_s'] * 1000:9.2f}ms  "
+            f"{row['queries_per_s']:12.1f} q/s  peak={row['peak_mb']:8.2f}MB"
+            + (f"  ⚠ {row['note']}" if row['note'] else ''))
+
+
+def environment_info(seed):
+    """Thông tin môi trường chạy, ghi kèm kết quả để so sánh giữa các máy"""
+    return {
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': seed,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def save_results(results, path, env):
+    """Ghi kết quả ra JSON (kèm thông tin môi trường) hoặc CSV tùy phần mở rộng của path"""
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'environment': env, 'results': results}, f, indent=2, ensure_ascii=False)
+
+
+def load_results(path):
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            for key in ('n_train', 'n_features', 'n_queries', 'k'):
+                row[key] = int(row[key])
+            row['predict_s'] = float(row['predict_s']) if row['predict_s'] else None
+        return rows
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+def compare_results(current, baseline, threshold=1.2):
+    """
+    So sánh thời gian predict với lần chạy trước
+
+    Returns:
+    - Danh sách (key, thời gian cũ, thời gian mới) của các trường hợp chậm hơn threshold lần
+    """
+    def key(row):
+        return row['backend'], row['n_train'], row['n_features'], row['n_queries'], row['k']
+
+    old = {key(r): r['predict_s'] for r in baseline if r.get('predict_s')}
+    regressions = []
+    for row in current:
+        before = old.get(key(row))
+        if before and row['predict_s'] and row['predict_s'] > threshold * before:
+            regressions.append((key(row), before, row['predict_s']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark KNN tự cài đặt so với sklearn")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="số dòng huấn luyện")
+    parser.add_argument('--features', type=int, nargs='+', default=DEFAULT_FEATURES, help="số đặc trưng")
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS)
+    parser.add_argument('--queries', type=positive_int, default=200, help="số query mỗi lần predict")
+    parser.add_argument('--k', type=positive_int, default=5)
+    parser.add_argument('--repeat', type=positive_int, default=3, help="số lần lặp, lấy thời gian nhỏ nhất")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_results.json', help="file kết quả .json hoặc .csv")
+    parser.add_argument('--compare', help="file kết quả cũ để phát hiện hồi quy hiệu năng")
+    parser.add_argument('--threshold', type=float, default=1.2, help="ngưỡng chậm hơn bao nhiêu lần thì báo")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("BENCHMARK KNN: loop / vectorized / kd_tree / ball_tree / sklearn")
+    print("=" * 80)
+    env = environment_info(args.seed)
+    results = run_benchmark(args.sizes, args.features, args.backends, n_queries=args.queries,
+                            k=args.k, repeat=args.repeat, seed=args.seed)
+    save_results(results, args.output, env)
+    print(f"\nĐã ghi {len(results)} kết quả vào {args.output}")
+
+    if args.compare:
+        regressions = compare_results(results, load_results(args.compare), args.threshold)
+        if not regressions:
+            print(f"✓ Không có trường hợp nào chậm hơn {args.threshold}x so với {args.compare}")
+        for (backend, n_train, n_features, _, _), before, after in regressions:
+            print(f"✗ {backend} n={n_train} d={n_features}: {before * 1000:.2f}ms → {after * 1000:.2f}ms")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,10 @@
+import bisect
+import functools
 import heapq
-from typing import List, Tuple, Dict, Set
+import mmap
+import os
+import random
+from typing import List, Tuple, Dict, Set, Optional
 
 # ==================================================
 # TRẠNG THÁI ĐÍCH
@@ -10,43 +15,52 @@ GOAL = [
     [6, 7, 8]
 ]
 
-# Pre-compute vị trí đích của mỗi số để tối ưu hóa manhattan_distance
-GOAL_POS: Dict[int, Tuple[int, int]] = {}
-for i in range(3):
-    for j in range(3):
-        GOAL_POS[GOAL[i][j]] = (i, j)
+
+def default_goal(n: int) -> List[List[int]]:
+    """Trạng thái đích mặc định của bảng n×n: ô trống ở góc trên trái, các số tăng dần theo hàng (như GOAL)."""
+    return [[n * i + j for j in range(n)] for i in range(n)]
+
+
+@functools.lru_cache(maxsize=None)
+def default_puzzle(n: int = 3) -> "SlidingPuzzle":
+    """Engine SlidingPuzzle cho bảng n×n với đích mặc định, dựng một lần cho mỗi n."""
+    return SlidingPuzzle(default_goal(n))
+
+
+def _resolve(state: List[List[int]], puzzle: Optional["SlidingPuzzle"]) -> "SlidingPuzzle":
+    """Engine được truyền vào (đích tùy ý), hoặc engine mặc định theo kích thước của state."""
+    return puzzle if puzzle is not None else default_puzzle(len(state))
 
 # ==================================================
 # HEURISTIC: MANHATTAN DISTANCE
 # ==================================================
-def manhattan_distance(state: List[List[int]]) -> int:
+def manhattan_distance(state: List[List[int]], puzzle: Optional["SlidingPuzzle"] = None) -> int:
     """
     Tính khoảng cách Manhattan từ trạng thái hiện tại đến trạng thái đích.
     Manhattan distance = tổng khoảng cách hàng + tổng khoảng cách cột của mỗi ô.
     """
+    puzzle = _resolve(state, puzzle)
     dist = 0
-    for i in range(3):
-        for j in range(3):
-            val = state[i][j]
+    for i, row in enumerate(state):
+        for j, val in enumerate(row):
             if val != 0:  # Bỏ qua ô trống
-                gi, gj = GOAL_POS[val]  # Vị trí đích của giá trị val
-                dist += abs(i - gi) + abs(j - gj)
+                dist += abs(i - puzzle.goal_row[val]) + abs(j - puzzle.goal_col[val])
     return dist
 
-def print_manhattan_detail(state: List[List[int]]) -> str:
+def print_manhattan_detail(state: List[List[int]], puzzle: Optional["SlidingPuzzle"] = None) -> str:
     """
     In chi tiết cách tính Manhattan distance cho mỗi ô.
     Trả về chuỗi mô tả chi tiết.
     """
+    puzzle = _resolve(state, puzzle)
     lines = []
     lines.append("   Chi tiết tính Manhattan distance:")
     total = 0
     
-    for i in range(3):
-        for j in range(3):
-            val = state[i][j]
+    for i, row in enumerate(state):
+        for j, val in enumerate(row):
             if val != 0:  # Bỏ qua ô trống
-                gi, gj = GOAL_POS[val]  # Vị trí đích của giá trị val
+                gi, gj = puzzle.goal_row[val], puzzle.goal_col[val]  # Vị trí đích của giá trị val
                 dist = abs(i - gi) + abs(j - gj)
                 total += dist
                 lines.append(f"      • Ô {val}: từ ({i},{j}) → ({gi},{gj}) = |{i}-{gi}| + |{j}-{gj}| = {dist}")
@@ -62,11 +76,12 @@ def get_neighbors(state: List[List[int]]) -> List[List[List[int]]]:
     Tạo các trạng thái kề bằng cách di chuyển ô trống lên/xuống/trái/phải.
     """
     neighbors = []
+    n = len(state)
     
     # Tìm vị trí ô trống (0)
     x, y = 0, 0
-    for i in range(3):
-        for j in range(3):
+    for i in range(n):
+        for j in range(n):
             if state[i][j] == 0:
                 x, y = i, j
                 break
@@ -74,7 +89,7 @@ def get_neighbors(state: List[List[int]]) -> List[List[List[int]]]:
     # Thử 4 hướng theo ưu tiên: trái, phải, lên, xuống
     for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
         nx, ny = x + dx, y + dy
-        if 0 <= nx < 3 and 0 <= ny < 3:
+        if 0 <= nx < n and 0 <= ny < n:
             # Tạo trạng thái mới bằng cách copy và hoán đổi
             new_state = [row[:] for row in state]  # Deep copy
             new_state[x][y], new_state[nx][ny] = new_state[nx][ny], new_state[x][y]
@@ -91,22 +106,26 @@ def to_tuple(state: List[List[int]]) -> Tuple:
 
 def states_equal(state1: List[List[int]], state2: List[List[int]]) -> bool:
     """Kiểm tra hai trạng thái có bằng nhau không."""
-    for i in range(3):
-        for j in range(3):
-            if state1[i][j] != state2[i][j]:
-                return False
+    if len(state1) != len(state2):
+        return False
+    for row1, row2 in zip(state1, state2):
+        if row1 != row2:
+            return False
     return True
 
 def print_puzzle_inline(state: List[List[int]]) -> List[str]:
     """Trả về các dòng của puzzle để in inline trong bảng."""
+    n = len(state)
+    width = len(str(n * n - 1))  # 1 ký tự cho 3x3, 2 ký tự cho 4x4 và 5x5
+    bar = "─" * (width + 2)
     lines = []
-    lines.append("┌───┬───┬───┐")
-    for i in range(3):
+    lines.append("┌" + "┬".join([bar] * n) + "┐")
+    for i in range(n):
         row = state[i]
-        lines.append("│ " + " │ ".join('_' if x == 0 else str(x) for x in row) + " │")
-        if i < 2:
-            lines.append("├───┼───┼───┤")
-    lines.append("└───┴───┴───┘")
+        lines.append("│ " + " │ ".join(('_' if x == 0 else str(x)).rjust(width) for x in row) + " │")
+        if i < n - 1:
+            lines.append("├" + "┼".join([bar] * n) + "┤")
+    lines.append("└" + "┴".join([bar] * n) + "┘")
     return lines
 
 def print_puzzle_box(state: List[List[int]]):
@@ -115,49 +134,646 @@ def print_puzzle_box(state: List[List[int]]):
         print(line)
 
 
+# ==================================================
+# ĐƯỜNG ĐI: CON TRỎ CHA
+# ==================================================
+class PathRef:
+    """
+    Đường đi tới một trạng thái lưu bằng con trỏ cha: (trạng thái cuối, PathRef của đoạn trước).
+    Mỗi nút được mở rộng tạo đúng một PathRef, các con của nó dùng chung -> O(1) mỗi lần push.
+    Chỉ khi heap phải phá hòa (cùng độ ưu tiên và cùng trạng thái) mới dựng lại list để so sánh,
+    nên thứ tự lấy ra khỏi heap giống hệt như khi lưu cả list path.
+    """
+    __slots__ = ("state", "parent")
+
+    def __init__(self, state=None, parent=None):
+        self.state = state    # None = đường đi rỗng (gốc)
+        self.parent = parent
+
+    def states(self) -> List[int]:
+        """Dựng lại danh sách trạng thái (nén) từ đầu đến cuối đường đi."""
+        out = []
+        node = self
+        while node.state is not None:
+            out.append(node.state)
+            node = node.parent
+        out.reverse()
+        return out
+
+    def __lt__(self, other: "PathRef") -> bool:
+        return self.states() < other.states()
+
+
+# ==================================================
+# ENGINE N×N: TRẠNG THÁI NÉN, HEURISTIC, TÌM KIẾM
+# ==================================================
+# Manhattan đủ cho 8-puzzle nhưng quá yếu với 15-puzzle (hàng chục triệu nút). Hai heuristic mạnh hơn:
+# - Linear conflict: hai ô cùng nằm trên hàng/cột đích nhưng ngược thứ tự → phải có ô rời hàng rồi quay lại (+2)
+# - Additive pattern database: chia các ô thành nhóm rời nhau, tra số bước tối thiểu của từng nhóm rồi cộng lại
+PDB_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdb_cache")
+HEURISTICS = ("manhattan", "linear_conflict", "pdb")
+
+
+def longest_increasing(seq: List[int]) -> int:
+    """Độ dài dãy con tăng ngặt dài nhất (patience sorting, O(k log k))."""
+    tails: List[int] = []
+    for x in seq:
+        i = bisect.bisect_left(tails, x)
+        if i == len(tails):
+            tails.append(x)
+        else:
+            tails[i] = x
+    return len(tails)
+
+
+class SlidingPuzzle:
+    """
+    Bảng trượt N×N với trạng thái đích tùy ý. Trạng thái nén thành một số nguyên: 4 bit mỗi ô
+    (5 bit khi N*N - 1 > 15, ví dụ 24-puzzle), ô (0, 0) ở các bit cao nhất nên thứ tự số nguyên trùng
+    thứ tự từ điển của tuple trạng thái -> heap phá hòa như với list. Bảng tra dựng một lần trong __init__:
+    - moves[p]: các vị trí ô trống có thể đi tới từ p (trái, phải, lên, xuống)
+    - manhattan_table[v][p]: khoảng cách Manhattan của ô v khi nằm ở vị trí p
+    - goal_row[v], goal_col[v]: hàng/cột đích của ô v (dùng cho linear conflict)
+    """
+
+    def __init__(self, goal: List[List[int]]):
+        n = len(goal)
+        flat = [val for row in goal for val in row]
+        if any(len(row) != n for row in goal) or sorted(flat) != list(range(n * n)):
+            raise ValueError("goal phải là bảng N×N chứa đúng các số 0..N*N-1")
+        self.n = n
+        self.size = n * n
+        self.bits = max(4, (self.size - 1).bit_length())
+        self.mask = (1 << self.bits) - 1
+        self.shift = [self.bits * (self.size - 1 - p) for p in range(self.size)]
+        self.goal = [row[:] for row in goal]
+        self.goal_code = self.encode(goal)
+        self.goal_pos = [0] * self.size
+        for p, val in enumerate(flat):
+            self.goal_pos[val] = p
+        self.goal_row = [p // n for p in self.goal_pos]
+        self.goal_col = [p % n for p in self.goal_pos]
+        # Linear conflict: line 0..N-1 là các hàng, N..2N-1 là các cột. line_rank[line][v] = cột (hay hàng)
+        # đích của ô v nếu v thuộc hàng (cột) đó ở trạng thái đích, ngược lại -1
+        self.line_shifts = ([[self.shift[n * r + c] for c in range(n)] for r in range(n)]
+                            + [[self.shift[n * r + c] for r in range(n)] for c in range(n)])
+        self.line_rank = ([[self.goal_col[v] if v and self.goal_row[v] == r else -1 for v in range(self.size)]
+                           for r in range(n)]
+                          + [[self.goal_row[v] if v and self.goal_col[v] == c else -1 for v in range(self.size)]
+                             for c in range(n)])
+
+        self.moves: List[Tuple[int, ...]] = []
+        for p in range(self.size):
+            x, y = divmod(p, n)
+            self.moves.append(tuple(n * (x + dx) + (y + dy) for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]
+                                    if 0 <= x + dx < n and 0 <= y + dy < n))
+        self.manhattan_table = [
+            [0 if v == 0 else abs(p // n - self.goal_row[v]) + abs(p % n - self.goal_col[v]) for p in range(self.size)]
+            for v in range(self.size)
+        ]
+
+        # Pattern database (nạp bằng load_pattern_databases): nhóm và trọng số chỉ số của từng ô
+        self.pdbs: List["PatternDatabase"] = []
+        self.pdb_group = [-1] * self.size
+        self.pdb_weight = [0] * self.size
+
+    # ---------- trạng thái nén ----------
+    def encode(self, state: List[List[int]]) -> int:
+        code = 0
+        for row in state:
+            for val in row:
+                code = (code << self.bits) | val
+        return code
+
+    def decode(self, code: int) -> List[List[int]]:
+        cells = self.cells(code)
+        return [cells[i:i + self.n] for i in range(0, self.size, self.n)]
+
+    def cells(self, code: int) -> List[int]:
+        """Danh sách giá trị theo vị trí p = 0..N*N-1."""
+        return [(code >> s) & self.mask for s in self.shift]
+
+    def blank_position(self, code: int) -> int:
+        for p, s in enumerate(self.shift):
+            if (code >> s) & self.mask == 0:
+                return p
+        raise ValueError("Trạng thái không có ô trống")
+
+    def is_solvable(self, code: int) -> bool:
+        """
+        Kiểm tra trạng thái nén có tới được đích không, trong O(N*N) và không cần tìm kiếm.
+
+        Mỗi bước đổi chỗ ô trống với một ô kề là một phép chuyển vị và dời ô trống 1 ô, nên tính chẵn lẻ
+        của hoán vị start → đích (tính cả ô trống) phải bằng tính chẵn lẻ khoảng cách Manhattan của ô
+        trống. Chẵn lẻ hoán vị = chẵn lẻ số nghịch thế = (N*N - số chu trình) mod 2; đếm chu trình chỉ
+        cần một lượt duyệt thay vì so từng cặp như đếm nghịch thế trực tiếp.
+        """
+        cells = self.cells(code)
+        if len(set(cells)) != self.size or max(cells) >= self.size:
+            raise ValueError("Trạng thái phải chứa đúng các số 0..N*N-1")
+        target = [self.goal_pos[v] for v in cells]  # ô đang ở vị trí p cần về vị trí target[p]
+        seen = [False] * self.size
+        cycles = 0
+        for p in range(self.size):
+            if not seen[p]:
+                cycles += 1
+                q = p
+                while not seen[q]:
+                    seen[q] = True
+                    q = target[q]
+        blank = cells.index(0)
+        blank_dist = abs(blank // self.n - self.goal_row[0]) + abs(blank % self.n - self.goal_col[0])
+        return (self.size - cycles) % 2 == blank_dist % 2
+
+    def scramble(self, steps: int, seed: Optional[int] = None) -> List[List[int]]:
+        """Trạng thái ngẫu nhiên (luôn giải được): đi ngẫu nhiên `steps` bước từ đích, không quay lui ngay."""
+        rng = random.Random(seed)
+        code, blank, prev = self.goal_code, self.blank_position(self.goal_code), -1
+        for _ in range(steps):
+            nb = rng.choice([q for q in self.moves[blank] if q != prev])
+            tile = (code >> self.shift[nb]) & self.mask
+            code = code - (tile << self.shift[nb]) + (tile << self.shift[blank])
+            prev, blank = blank, nb
+        return self.decode(code)
+
+    # ---------- heuristic ----------
+    def manhattan(self, code: int) -> int:
+        table = self.manhattan_table
+        return sum(table[v][p] for p, v in enumerate(self.cells(code)))
+
+    def _line_conflict(self, code: int, line: int) -> int:
+        """Số bước cộng thêm trên một hàng (line < N) hoặc một cột (line >= N): 2 * (k - LIS)."""
+        rank = self.line_rank[line]
+        mask = self.mask
+        seq = [r for r in [rank[(code >> s) & mask] for s in self.line_shifts[line]] if r >= 0]
+        if len(seq) < 2:
+            return 0
+        return 2 * (len(seq) - longest_increasing(seq))
+
+    def linear_conflict(self, code: int) -> int:
+        """Phần cộng thêm của linear conflict trên mọi hàng và cột (cộng với Manhattan vẫn chấp nhận được)."""
+        return sum(self._line_conflict(code, line) for line in range(2 * self.n))
+
+    def default_pattern_groups(self) -> List[Tuple[int, ...]]:
+        """Chia các ô (trừ ô trống) theo thứ tự vị trí đích: nhóm 4 ô với 3x3 (4-4), 5 ô với 4x4 (5-5-5)."""
+        tiles = [val for row in self.goal for val in row if val]
+        k = 4 if self.n <= 3 else 5
+        return [tuple(tiles[i:i + k]) for i in range(0, len(tiles), k)]
+
+    def load_pattern_databases(self, groups: Optional[List[Tuple[int, ...]]] = None,
+                               cache_dir: str = PDB_CACHE_DIR) -> List["PatternDatabase"]:
+        """
+        Nạp (hoặc dựng lần đầu rồi ghi ra cache_dir) các pattern database cộng tính.
+        Các nhóm phải rời nhau và phủ mọi ô khác 0 để tổng vẫn là cận dưới và mạnh hơn Manhattan.
+        """
+        groups = groups or self.default_pattern_groups()
+        covered = sorted(t for group in groups for t in group)
+        if covered != list(range(1, self.size)):
+            raise ValueError("Các nhóm pattern phải rời nhau và phủ đúng các ô 1..N*N-1")
+        self.close_pattern_databases()
+        self.pdbs = [PatternDatabase(self, group, cache_dir).load() for group in groups]
+        for g, group in enumerate(groups):
+            for i, t in enumerate(group):
+                self.pdb_group[t] = g
+                self.pdb_weight[t] = self.size ** i
+        return self.pdbs
+
+    def close_pattern_databases(self):
+        for pdb in self.pdbs:
+            pdb.close()
+        self.pdbs = []
+
+    def heuristic(self, code: int, kind: str = "manhattan") -> Tuple[int, Optional[Tuple[int, ...]]]:
+        """
+        Tính h(n) đầy đủ cho một trạng thái. Trả về (h, aux): aux là chỉ số trong từng pattern
+        database (kind="pdb") để các trạng thái con cập nhật tăng dần, None với các loại còn lại.
+        """
+        if kind == "manhattan":
+            return self.manhattan(code), None
+        if kind == "linear_conflict":
+            return self.manhattan(code) + self.linear_conflict(code), None
+        if kind == "pdb":
+            if not self.pdbs:
+                self.load_pattern_databases()
+            idx = tuple(pdb.index(code) for pdb in self.pdbs)
+            return sum(pdb[i] for pdb, i in zip(self.pdbs, idx)), idx
+        raise ValueError(f"heuristic không hợp lệ: '{kind}', chọn một trong {HEURISTICS}")
+
+    def child_heuristic(self, kind: str, h: int, aux, code: int, child: int,
+                        tile: int, blank: int, nb: int) -> Tuple[int, Optional[Tuple[int, ...]]]:
+        """
+        h(n) của trạng thái con khi ô `tile` đi từ nb sang blank, tính tăng dần từ h của cha:
+        - Manhattan: chỉ đóng góp của `tile` thay đổi
+        - Linear conflict: đi ngang không đổi thứ tự trong hàng, và trong 2 cột bị ảnh hưởng chỉ cột đích
+          của `tile` có thể đổi (các ô khác giữ nguyên thứ tự) → tính lại nhiều nhất 1 cột (đi dọc: 1 hàng)
+        - PDB: chỉ nhóm chứa `tile` đổi chỉ số, idx += (blank - nb) * size^i
+        """
+        if kind == "pdb":
+            g = self.pdb_group[tile]
+            pdb = self.pdbs[g]
+            old = aux[g]
+            new = old + (blank - nb) * self.pdb_weight[tile]
+            return h - pdb[old] + pdb[new], aux[:g] + (new,) + aux[g + 1:]
+        h += self.manhattan_table[tile][blank] - self.manhattan_table[tile][nb]
+        if kind == "linear_conflict":
+            n = self.n
+            if blank // n == nb // n:
+                home = self.goal_col[tile]
+                line = n + home if home == blank % n or home == nb % n else -1
+            else:
+                home = self.goal_row[tile]
+                line = home if home == blank // n or home == nb // n else -1
+            if line >= 0:
+                h += self._line_conflict(child, line) - self._line_conflict(code, line)
+        return h, None
+
+    # ---------- tìm kiếm ----------
+    def greedy(self, start: List[List[int]], heuristic: str = "manhattan") -> Tuple[List[List[List[int]]], int, int]:
+        """
+        Greedy Best-First Search: priority = h(n), không có g(n).
+
+        Returns:
+            (path, nodes_expanded, nodes_generated)
+        """
+        start_c = self.encode(start)
+        if not self.is_solvable(start_c):  # khác tính chẵn lẻ với đích → không cần tìm kiếm
+            return [], 0, 0
+        h0, aux0 = self.heuristic(start_c, heuristic)
+        moves, shift, mask, goal_code = self.moves, self.shift, self.mask, self.goal_code
+        child_heuristic = self.child_heuristic
+
+        pq = [(h0, start_c, self.blank_position(start_c), PathRef(), aux0)]
+        visited: Set[int] = set()
+        nodes_expanded = 0
+        nodes_generated = 1
+        while pq:
+            h, current, blank, path, aux = heapq.heappop(pq)
+            if current in visited:
+                continue
+            if current == goal_code:
+                return [self.decode(c) for c in path.states() + [current]], nodes_expanded, nodes_generated
+            visited.add(current)
+            nodes_expanded += 1
+            # đường đi tới current, dùng chung cho mọi trạng thái kề (không sao chép path)
+            current_path = PathRef(current, path)
+            # sinh các trạng thái kề: đổi chỗ ô trống với ô ở vị trí nb ngay trên số nguyên
+            for nb in moves[blank]:
+                tile = (current >> shift[nb]) & mask
+                n_c = current - (tile << shift[nb]) + (tile << shift[blank])
+                if n_c not in visited:
+                    n_h, n_aux = child_heuristic(heuristic, h, aux, current, n_c, tile, blank, nb)
+                    heapq.heappush(pq, (n_h, n_c, nb, current_path, n_aux))
+                    nodes_generated += 1
+        return [], nodes_expanded, nodes_generated
+
+    def astar(self, start: List[List[int]], heuristic: str = "manhattan") -> Tuple[List[List[List[int]]], int, int]:
+        """
+        A* trên trạng thái nén, với heuristic chọn được và h(n) cập nhật tăng dần từ ô vừa di chuyển.
+
+        Args:
+            start: Trạng thái ban đầu (mảng N×N)
+            heuristic: "manhattan", "linear_conflict" (Manhattan + linear conflict) hoặc "pdb"
+
+        Returns:
+            (path, nodes_expanded, nodes_generated)
+        """
+        start_c = self.encode(start)
+        if not self.is_solvable(start_c):  # khác tính chẵn lẻ với đích → không cần tìm kiếm
+            return [], 0, 0
+        h0, aux0 = self.heuristic(start_c, heuristic)
+        moves, shift, mask, goal_code = self.moves, self.shift, self.mask, self.goal_code
+        child_heuristic = self.child_heuristic
+
+        pq = [(h0, 0, start_c, self.blank_position(start_c), PathRef(), h0, aux0)]
+        visited: Set[int] = set()
+        g_score: Dict[int, int] = {start_c: 0}
+        nodes_expanded = 0
+        nodes_generated = 1
+        while pq:
+            f, g, current, blank, path, h, aux = heapq.heappop(pq)
+            if current in visited:
+                continue
+            if current == goal_code:
+                return [self.decode(c) for c in path.states() + [current]], nodes_expanded, nodes_generated
+            visited.add(current)
+            nodes_expanded += 1
+            current_path = PathRef(current, path)
+            new_g = g + 1
+            for nb in moves[blank]:
+                tile = (current >> shift[nb]) & mask
+                n_c = current - (tile << shift[nb]) + (tile << shift[blank])
+                if n_c in visited or g_score.get(n_c, new_g + 1) <= new_g:
+                    continue
+                g_score[n_c] = new_g
+                n_h, n_aux = child_heuristic(heuristic, h, aux, current, n_c, tile, blank, nb)
+                heapq.heappush(pq, (new_g + n_h, new_g, n_c, nb, current_path, n_h, n_aux))
+                nodes_generated += 1
+        return [], nodes_expanded, nodes_generated
+
+    def ida_star(self, start: List[List[int]], heuristic: str = "linear_conflict",
+                 max_table: int = 1_000_000) -> Tuple[List[List[List[int]]], int, int]:
+        """
+        IDA*: tìm kiếm theo chiều sâu với ngưỡng f tăng dần (ngưỡng mới = f nhỏ nhất vượt ngưỡng cũ).
+        Bộ nhớ chỉ gồm đường đi hiện tại và bảng chuyển vị (transposition table) tối đa max_table mục,
+        thay vì heap + visited của A* vốn phình theo số nút → giải được 15- và 24-puzzle.
+
+        Bảng chuyển vị lưu g nhỏ nhất đã gặp của mỗi trạng thái trong vòng lặp hiện tại: tới lại trạng
+        thái đó bằng đường không ngắn hơn thì cắt nhánh (cây con đã được duyệt với ngân sách lớn hơn).
+        Khi bảng đầy thì chỉ cập nhật các mục đã có; lời giải vẫn tối ưu vì heuristic chấp nhận được.
+
+        Args:
+            start: Trạng thái ban đầu (mảng N×N)
+            heuristic: "manhattan", "linear_conflict" hoặc "pdb"
+            max_table: Số mục tối đa của bảng chuyển vị (0 = IDA* thuần, chỉ tránh quay lui ngay)
+
+        Returns:
+            (path, nodes_expanded, nodes_generated)
+        """
+        start_c = self.encode(start)
+        if not self.is_solvable(start_c):  # khác tính chẵn lẻ với đích → không cần tìm kiếm
+            return [], 0, 0
+        h0, aux0 = self.heuristic(start_c, heuristic)
+        moves, shift, mask, goal_code = self.moves, self.shift, self.mask, self.goal_code
+        child_heuristic = self.child_heuristic
+        found = -1
+        path = [start_c]
+        table: Dict[int, int] = {}
+        nodes_expanded = 0
+        nodes_generated = 1
+
+        def search(current: int, blank: int, prev: int, g: int, h: int, aux, bound: int) -> float:
+            """Trả về found nếu tới đích, ngược lại f nhỏ nhất vượt bound trong cây con."""
+            nonlocal nodes_expanded, nodes_generated
+            if g + h > bound:
+                return g + h
+            if current == goal_code:
+                return found
+            nodes_expanded += 1
+            minimum = float("inf")
+            new_g = g + 1
+            for nb in moves[blank]:
+                if nb == prev:  # không đi ngược lại bước vừa rồi
+                    continue
+                tile = (current >> shift[nb]) & mask
+                n_c = current - (tile << shift[nb]) + (tile << shift[blank])
+                seen = table.get(n_c)
+                if seen is not None:
+                    if seen <= new_g:
+                        continue
+                    table[n_c] = new_g
+                elif len(table) < max_table:
+                    table[n_c] = new_g
+                nodes_generated += 1
+                n_h, n_aux = child_heuristic(heuristic, h, aux, current, n_c, tile, blank, nb)
+                path.append(n_c)
+                t = search(n_c, nb, blank, new_g, n_h, n_aux, bound)
+                if t == found:
+                    return found
+                path.pop()
+                if t < minimum:
+                    minimum = t
+            return minimum
+
+        bound = h0
+        blank0 = self.blank_position(start_c)
+        while True:
+            table.clear()
+            table[start_c] = 0
+            t = search(start_c, blank0, -1, 0, h0, aux0, bound)
+            if t == found:
+                return [self.decode(c) for c in path], nodes_expanded, nodes_generated
+            if t == float("inf"):
+                return [], nodes_expanded, nodes_generated
+            bound = t
+
+    def bidirectional(self, start: List[List[int]],
+                      heuristic: Optional[str] = None) -> Tuple[List[List[List[int]]], int, int]:
+        """
+        Tìm kiếm hai chiều: đồng thời từ start về đích và từ đích về start, dừng khi hai phía gặp nhau.
+        Mỗi phía chỉ cần đi khoảng nửa độ sâu lời giải nên frontier nhỏ hơn nhiều với lời giải dài.
+        - heuristic=None: BFS hai chiều theo từng lớp, luôn mở rộng phía có frontier nhỏ hơn
+        - "manhattan" / "linear_conflict": A* hai chiều; chiều ngược dùng engine có đích = start.
+          Dừng khi chi phí gặp nhau tốt nhất μ ≤ max(f nhỏ nhất hai phía) → lời giải vẫn tối ưu.
+        ("pdb" không hỗ trợ: chiều ngược sẽ cần dựng pattern database riêng cho từng start.)
+
+        Returns:
+            (path, nodes_expanded, nodes_generated)
+        """
+        start_c = self.encode(start)
+        if not self.is_solvable(start_c):
+            return [], 0, 0
+        if start_c == self.goal_code:
+            return [self.decode(start_c)], 0, 1
+        if heuristic is None:
+            return self._bidirectional_bfs(start_c)
+        if heuristic not in ("manhattan", "linear_conflict"):
+            raise ValueError("bidirectional chỉ hỗ trợ heuristic None, 'manhattan' hoặc 'linear_conflict'")
+
+        goal_c = self.goal_code
+        engines = (self, SlidingPuzzle(self.decode(start_c)))  # phía ngược: h(n) ước lượng về start
+        moves, shift, mask = self.moves, self.shift, self.mask
+        h_start, h_goal = self.heuristic(start_c, heuristic)[0], engines[1].heuristic(goal_c, heuristic)[0]
+        pq = ([(h_start, 0, start_c, self.blank_position(start_c), h_start)],
+              [(h_goal, 0, goal_c, self.blank_position(goal_c), h_goal)])
+        g_score: Tuple[Dict[int, int], Dict[int, int]] = ({start_c: 0}, {goal_c: 0})
+        parents: Tuple[Dict[int, Optional[int]], Dict[int, Optional[int]]] = ({start_c: None}, {goal_c: None})
+        best, meet = float("inf"), None
+        nodes_expanded = 0
+        nodes_generated = 2
+        while pq[0] and pq[1]:
+            # Mọi đường đi chưa tìm thấy đều dài ít nhất bằng f nhỏ nhất của mỗi phía
+            if best <= max(pq[0][0][0], pq[1][0][0]):
+                break
+            side = 0 if len(pq[0]) <= len(pq[1]) else 1
+            mine, other, engine = g_score[side], g_score[1 - side], engines[side]
+            f, g, current, blank, h = heapq.heappop(pq[side])
+            if g > mine[current]:  # mục cũ, đã có đường ngắn hơn tới current
+                continue
+            nodes_expanded += 1
+            new_g = g + 1
+            for nb in moves[blank]:
+                tile = (current >> shift[nb]) & mask
+                n_c = current - (tile << shift[nb]) + (tile << shift[blank])
+                if mine.get(n_c, new_g + 1) <= new_g:
+                    continue
+                mine[n_c] = new_g
+                parents[side][n_c] = current
+                n_h, _ = engine.child_heuristic(heuristic, h, None, current, n_c, tile, blank, nb)
+                heapq.heappush(pq[side], (new_g + n_h, new_g, n_c, nb, n_h))
+                nodes_generated += 1
+                if n_c in other and new_g + other[n_c] < best:
+                    best, meet = new_g + other[n_c], n_c
+        if meet is None:
+            return [], nodes_expanded, nodes_generated
+        return self._join_paths(meet, parents), nodes_expanded, nodes_generated
+
+    def _bidirectional_bfs(self, start_c: int) -> Tuple[List[List[List[int]]], int, int]:
+        """
+        BFS hai chiều theo lớp. Khi một lớp chạm phía bên kia thì vẫn duyệt hết lớp đó và lấy điểm gặp
+        có tổng độ sâu nhỏ nhất (mọi đường đi ngắn hơn đã bị phát hiện ở các lớp trước).
+        """
+        goal_c = self.goal_code
+        moves, shift, mask = self.moves, self.shift, self.mask
+        depth: Tuple[Dict[int, int], Dict[int, int]] = ({start_c: 0}, {goal_c: 0})
+        parents: Tuple[Dict[int, Optional[int]], Dict[int, Optional[int]]] = ({start_c: None}, {goal_c: None})
+        frontier = [[(start_c, self.blank_position(start_c))], [(goal_c, self.blank_position(goal_c))]]
+        nodes_expanded = 0
+        nodes_generated = 2
+        while frontier[0] and frontier[1]:
+            side = 0 if len(frontier[0]) <= len(frontier[1]) else 1
+            mine, other = depth[side], depth[1 - side]
+            best, meet = float("inf"), None
+            next_frontier = []
+            for current, blank in frontier[side]:
+                nodes_expanded += 1
+                new_g = mine[current] + 1
+                for nb in moves[blank]:
+                    tile = (current >> shift[nb]) & mask
+                    n_c = current - (tile << shift[nb]) + (tile << shift[blank])
+                    if n_c in mine:
+                        continue
+                    mine[n_c] = new_g
+                    parents[side][n_c] = current
+                    next_frontier.append((n_c, nb))
+                    nodes_generated += 1
+                    if n_c in other and new_g + other[n_c] < best:
+                        best, meet = new_g + other[n_c], n_c
+            frontier[side] = next_frontier
+            if meet is not None:
+                return self._join_paths(meet, parents), nodes_expanded, nodes_generated
+        return [], nodes_expanded, nodes_generated
+
+    def _join_paths(self, meet: int, parents) -> List[List[List[int]]]:
+        """Ghép đường start → meet (con trỏ cha phía xuôi) với meet → đích (con trỏ cha phía ngược)."""
+        path = []
+        code = meet
+        while code is not None:
+            path.append(code)
+            code = parents[0][code]
+        path.reverse()
+        code = parents[1][meet]
+        while code is not None:
+            path.append(code)
+            code = parents[1][code]
+        return [self.decode(c) for c in path]
+
+
+class PatternDatabase:
+    """
+    Pattern database cộng tính cho một nhóm ô của SlidingPuzzle.
+
+    Với mọi cách đặt các ô trong nhóm lên bảng, lưu số bước tối thiểu của riêng các ô này để về
+    vị trí đích (bước của ô ngoài nhóm tính 0) → tổng trên các nhóm rời nhau vẫn là cận dưới.
+    Chỉ số idx = Σ vị trí(tiles[i]) * size^i, mỗi giá trị 1 byte. Bảng được dựng một lần bằng BFS,
+    ghi ra file trong cache_dir; các lần chạy sau chỉ mmap file (chỉ đọc, không nạp cả bảng vào RAM).
+    Nhóm 5 ô của 4x4 (1 MB) dựng mất khoảng vài chục giây; với 5x5 nên dùng linear_conflict.
+    """
+
+    def __init__(self, puzzle: SlidingPuzzle, tiles: Tuple[int, ...], cache_dir: str = PDB_CACHE_DIR):
+        self.puzzle = puzzle
+        self.tiles = tuple(tiles)
+        self.n_entries = puzzle.size ** len(self.tiles)
+        name = f"pdb_{puzzle.n}x{puzzle.n}_{puzzle.goal_code:x}_{'-'.join(map(str, self.tiles))}.bin"
+        self.path = os.path.join(cache_dir, name)
+        self._file = None
+        self._table = None
+
+    def index(self, code: int) -> int:
+        """Chỉ số của trạng thái nén trong bảng (chỉ phụ thuộc vị trí các ô của nhóm)."""
+        pz = self.puzzle
+        pos = {v: p for p, v in enumerate(pz.cells(code))}
+        return sum(pos[t] * pz.size ** i for i, t in enumerate(self.tiles))
+
+    def __getitem__(self, idx: int) -> int:
+        return self._table[idx]
+
+    def load(self) -> "PatternDatabase":
+        """mmap bảng từ cache; nếu chưa có (hoặc sai kích thước) thì dựng và ghi ra trước."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) != self.n_entries:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            table = self.build()
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(table)
+            os.replace(tmp, self.path)
+        self._file = open(self.path, "rb")
+        self._table = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self
+
+    def close(self):
+        if self._table is not None:
+            self._table.close()
+            self._file.close()
+            self._table = self._file = None
+
+    def build(self) -> bytearray:
+        """
+        BFS ngược từ trạng thái đích trên không gian rút gọn: (vị trí các ô trong nhóm, vùng ô trống).
+        Ô trống đi qua các ô ngoài nhóm không tốn chi phí nên chỉ cần biết vùng liên thông nó chạm tới
+        (bitmask, loang bằng phép dịch bit); mỗi cạnh là một bước của một ô trong nhóm vào vùng đó.
+        """
+        pz = self.puzzle
+        n, size, moves = pz.n, pz.size, pz.moves
+        full = (1 << size) - 1
+        first_col = sum(1 << (n * r) for r in range(n))
+        not_first_col = full & ~first_col                # chặn dịch trái tràn sang hàng dưới
+        not_last_col = full & ~(first_col << (n - 1))    # chặn dịch phải tràn sang hàng trên
+
+        def flood(seed: int, free: int) -> int:
+            region = seed
+            while True:
+                grown = (region | ((region << 1) & not_first_col) | ((region >> 1) & not_last_col)
+                         | (region << n) | (region >> n)) & free
+                if grown == region:
+                    return region
+                region = grown
+
+        weights = [size ** i for i in range(len(self.tiles))]
+        positions = tuple(pz.goal_pos[t] for t in self.tiles)
+        occupied = sum(1 << p for p in positions)
+        region = flood(1 << pz.goal_pos[0], full & ~occupied)
+        idx = sum(p * w for p, w in zip(positions, weights))
+
+        table = bytearray(b"\xff") * self.n_entries
+        table[idx] = 0
+        seen = {(idx << size) | region}
+        frontier = [(positions, idx, occupied, region)]
+        depth = 0
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for positions, idx, occupied, region in frontier:
+                for i, p in enumerate(positions):
+                    for q in moves[p]:
+                        if not (region >> q) & 1:
+                            continue
+                        n_occupied = occupied ^ (1 << p) ^ (1 << q)
+                        n_region = flood(1 << p, full & ~n_occupied)
+                        n_idx = idx + (q - p) * weights[i]
+                        key = (n_idx << size) | n_region
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        if table[n_idx] == 0xFF:
+                            table[n_idx] = depth
+                        next_frontier.append((positions[:i] + (q,) + positions[i + 1:], n_idx, n_occupied, n_region))
+            frontier = next_frontier
+        return table
+
+
 # ==================================================
 # THUẬT TOÁN TÌM KIẾM
 # ==================================================
-def greedy_bfs(start: List[List[int]]) -> Tuple[List[List[List[int]]], int, int]:
+def greedy_bfs(start: List[List[int]], puzzle: Optional[SlidingPuzzle] = None) -> Tuple[List[List[List[int]]], int, int]:
     """
     Greedy Best-First Search
     Priority = h(n) only (không có g(n))
-    Lưu tuple state trong heap để tránh dùng counter
+    Lưu trạng thái nén (số nguyên) trong heap để tránh dùng counter
     """
-    pq = []
-    visited: Set[Tuple] = set()
-    # push trạng thái ban đầu (dùng tuple thay vì list)
-    start_t = to_tuple(start)
-    heapq.heappush(
-        pq,
-        (manhattan_distance(start), start_t, [])
-    )
-    nodes_expanded = 0
-    nodes_generated = 1
-    while pq:
-        h, current_t, path = heapq.heappop(pq)
-        # nếu đã thăm → bỏ
-        if current_t in visited:
-            continue
-        # chuyển tuple về list để xử lý
-        current = [list(row) for row in current_t]
-        # nếu đạt đích
-        if states_equal(current, GOAL):
-            return path + [current], nodes_expanded, nodes_generated
-        visited.add(current_t)
-        nodes_expanded += 1
-        # sinh các trạng thái kề
-        for neighbor in get_neighbors(current):
-            n_t = to_tuple(neighbor)
-            if n_t not in visited:
-                heapq.heappush(
-                    pq,
-                    (manhattan_distance(neighbor), n_t, path + [current])
-                )
-                nodes_generated += 1
-    return [], nodes_expanded, nodes_generated
+    return _resolve(start, puzzle).greedy(start)
 
-def astar_search(start: List[List[int]]) -> Tuple[List[List[List[int]]], int, int]:
+def astar_search(start: List[List[int]], puzzle: Optional[SlidingPuzzle] = None,
+                 heuristic: str = "manhattan") -> Tuple[List[List[List[int]]], int, int]:
     """
     Thuật toán A* Search.
     
@@ -165,84 +781,63 @@ def astar_search(start: List[List[int]]) -> Tuple[List[List[List[int]]], int, in
     - g(n): Chi phí thực tế từ điểm bắt đầu (số bước đã đi)
     - h(n): Ước lượng chi phí đến đích (Manhattan distance)
     - Kết hợp cả chi phí đã đi và ước lượng còn lại
-    - Lưu tuple state trong heap để tránh dùng counter
+    - Lưu trạng thái nén (số nguyên) trong heap để tránh dùng counter
     
     Args:
-        start: Trạng thái ban đầu (mảng 2D)
+        start: Trạng thái ban đầu (mảng 2D N×N)
+        puzzle: Engine SlidingPuzzle (đích tùy ý); mặc định là đích chuẩn theo kích thước của start
+        heuristic: "manhattan", "linear_conflict" hoặc "pdb"
     
     Returns:
         (path, nodes_expanded, nodes_generated)
     """
-    pq = []
-    visited: Set[Tuple] = set()
-    g_score: Dict[Tuple, int] = {}
-    
-    # Tính heuristic ban đầu
-    h0 = manhattan_distance(start)
-    start_t = to_tuple(start)
-    
-    # Priority dựa vào f(n) = g(n) + h(n)
-    priority = 0 + h0  # f = g + h
-    
-    # Lưu (f, g, state_tuple, path) trong heap
-    heapq.heappush(pq, (priority, 0, start_t, []))
-    g_score[start_t] = 0
-    
-    nodes_expanded = 0
-    nodes_generated = 1
+    return _resolve(start, puzzle).astar(start, heuristic)
+
+def ida_star_search(start: List[List[int]], puzzle: Optional[SlidingPuzzle] = None,
+                    heuristic: str = "linear_conflict",
+                    max_table: int = 1_000_000) -> Tuple[List[List[List[int]]], int, int]:
+    """
+    Thuật toán IDA* (lặp sâu dần theo ngưỡng f) với bảng chuyển vị giới hạn kích thước.
+    Bộ nhớ bị chặn bởi max_table thay vì tăng theo số nút như A*: dùng cho 15- và 24-puzzle.
     
-    while pq:
-        f, g, current_t, path = heapq.heappop(pq)
-        
-        # Kiểm tra đã thăm chưa
-        if current_t in visited:
-            continue
-        
-        # Chuyển tuple về list để xử lý
-        current = [list(row) for row in current_t]
-        
-        # Kiểm tra đạt đích chưa
-        if states_equal(current, GOAL):
-            return path + [current], nodes_expanded, nodes_generated
-        
-        visited.add(current_t)
-        nodes_expanded += 1
-        
-        # Mở rộng các trạng thái kề
-        for neighbor in get_neighbors(current):
-            n_t = to_tuple(neighbor)
-            new_g = g + 1
-            
-            if n_t in visited:
-                continue
-            
-            # Kiểm tra xem có tìm được đường đi tốt hơn không
-            if n_t in g_score and new_g >= g_score[n_t]:
-                continue
-            
-            g_score[n_t] = new_g
-            h = manhattan_distance(neighbor)
-            
-            # A*: Priority = f(n) = g(n) + h(n)
-            priority = new_g + h
-            
-            heapq.heappush(
-                pq,
-                (priority, new_g, n_t, path + [current])
-            )
-            nodes_generated += 1
+    Returns:
+        (path, nodes_expanded, nodes_generated)
+    """
+    return _resolve(start, puzzle).ida_star(start, heuristic, max_table)
+
+def bidirectional_search(start: List[List[int]], puzzle: Optional[SlidingPuzzle] = None,
+                         heuristic: Optional[str] = None) -> Tuple[List[List[List[int]]], int, int]:
+    """
+    Tìm kiếm hai chiều từ start và từ đích cùng lúc: BFS (heuristic=None) hoặc A* hai chiều
+    ("manhattan" / "linear_conflict"). Lời giải tối ưu như A*.
     
-    return [], nodes_expanded, nodes_generated
+    Returns:
+        (path, nodes_expanded, nodes_generated)
+    """
+    return _resolve(start, puzzle).bidirectional(start, heuristic)
 
+def is_solvable(state: List[List[int]], puzzle: Optional[SlidingPuzzle] = None) -> bool:
+    """Kiểm tra O(N*N) theo tính chẵn lẻ: trạng thái có tới được đích của puzzle không."""
+    puzzle = _resolve(state, puzzle)
+    return puzzle.is_solvable(puzzle.encode(state))
 # ==================================================
 # IN LỜI GIẢI
 # ==================================================
-def print_solution(path: List[List[List[int]]], nodes_expanded: int, nodes_generated: int):
+def print_solution(path: List[List[List[int]]], nodes_expanded: int, nodes_generated: int,
+                   puzzle: Optional[SlidingPuzzle] = None, elapsed: Optional[float] = None,
+                   show_steps: bool = True):
+    """
+    In bảng từng bước (h, g, f) và thống kê. elapsed (giây) nếu có thì in kèm tốc độ nút/giây;
+    show_steps=False chỉ in thống kê (lời giải dài của 15/24-puzzle).
+    """
     if not path:
         print("❌ Không tìm thấy lời giải!")
         return
     
     steps = len(path) - 1
+    if not show_steps:
+        _print_stats(steps, nodes_expanded, nodes_generated, elapsed)
+        return
     # In header của bảng
     print("\n┌────────┬────────┬────────┬────────┬─────────────────────────────────────────┐")
     print(f"│{'Bước':^8}│ {'h(n)':^6} │ {'g(n)':^6} │ {'f(n)':^6} │{'Trạng thái Puzzle':<40} │")
@@ -250,7 +845,7 @@ def print_solution(path: List[List[List[int]]], nodes_expanded: int, nodes_gener
     
     # In từng bước
     for step, state in enumerate(path):
-        h = manhattan_distance(state)
+        h = manhattan_distance(state, puzzle)
         g = step
         f = g + h
         
@@ -276,11 +871,16 @@ def print_solution(path: List[List[List[int]]], nodes_expanded: int, nodes_gener
             print("├"+ "─" * 7 + "─┼─" + "─" * 6 + "─┼─" + "─" * 6 + "─┼─" + "─" * 6 + "─┼─" + "─" * 40 + "┤")
     
     print("└────────┴────────┴────────┴────────┴─────────────────────────────────────────┘")
-    
+    _print_stats(steps, nodes_expanded, nodes_generated, elapsed)
+
+def _print_stats(steps: int, nodes_expanded: int, nodes_generated: int, elapsed: Optional[float]):
     print(f"\n📊 THỐNG KÊ TỔNG QUAN:")
     print(f"   • Số bước di chuyển: {steps}")
     print(f"   • Số nút được mở rộng (explored): {nodes_expanded}")
     print(f"   • Số nút được sinh ra (generated): {nodes_generated}")    
+    if elapsed is not None:
+        print(f"   • Thời gian: {elapsed:.3f}s")
+        print(f"   • Tốc độ: {nodes_expanded / max(elapsed, 1e-9):,.0f} nút mở rộng/giây")
     print("\n" + "=" * 80)
 
 # ==================================================
@@ -341,6 +941,95 @@ def main():
     path_astar, nodes_astar, gen_astar = astar_search(start)
     
     print_solution(path_astar, nodes_astar, gen_astar)
+    
+    # =====================================================================
+    # THUẬT TOÁN 3: A* VỚI HEURISTIC MẠNH HƠN (LINEAR CONFLICT, PATTERN DATABASE)
+    # =====================================================================
+    import time
+    print("\n" + "=" * 80)
+    print("THUẬT TOÁN 3: A* VỚI LINEAR CONFLICT VÀ PATTERN DATABASE")
+    print("=" * 80)
+    print("📖 h(n) càng sát chi phí thật thì A* càng mở rộng ít nút (cả 3 đều chấp nhận được → lời giải tối ưu)")
+    puzzle = default_puzzle(3)
+    for kind in HEURISTICS:
+        t0 = time.perf_counter()
+        path, expanded, generated = astar_search(start, heuristic=kind)
+        elapsed = time.perf_counter() - t0
+        print(f"   • {kind:<16} h(đầu) = {puzzle.heuristic(puzzle.encode(start), kind)[0]:>2} | "
+              f"{len(path) - 1} bước | mở rộng {expanded:>6} nút | {elapsed * 1000:8.1f} ms")
+
+    # =====================================================================
+    # THUẬT TOÁN 4: IDA* VỚI BẢNG CHUYỂN VỊ (15-PUZZLE, 24-PUZZLE)
+    # =====================================================================
+    print("\n" + "=" * 80)
+    print("THUẬT TOÁN 4: IDA* VỚI BẢNG CHUYỂN VỊ TRÊN BẢNG N×N")
+    print("=" * 80)
+    print("📖 DFS lặp sâu dần theo ngưỡng f: bộ nhớ chỉ gồm đường đi hiện tại + bảng chuyển vị giới hạn,")
+    print("   trong khi heap/visited của A* tăng theo số nút mở rộng")
+
+    puzzle15 = default_puzzle(4)
+    start15 = puzzle15.scramble(1000, seed=1)
+    print("\n📌 15-PUZZLE NGẪU NHIÊN:")
+    print_puzzle_box(start15)
+    print(f"   (Lần đầu sẽ dựng pattern database 5-5-5 và ghi vào {PDB_CACHE_DIR}, mất khoảng 1 phút)")
+    t0 = time.perf_counter()
+    puzzle15.load_pattern_databases()
+    print(f"   Nạp pattern database: {time.perf_counter() - t0:.2f}s")
+    for name, search in (("A* + PDB", astar_search), ("IDA* + PDB", ida_star_search)):
+        t0 = time.perf_counter()
+        path, expanded, generated = search(start15, puzzle15, heuristic="pdb")
+        elapsed = time.perf_counter() - t0
+        print(f"\n▶ {name}:")
+        print_solution(path, expanded, generated, puzzle15, elapsed, show_steps=False)
+    puzzle15.close_pattern_databases()
+
+    puzzle24 = default_puzzle(5)
+    start24 = puzzle24.scramble(60, seed=1)
+    print("\n📌 24-PUZZLE (5 bit mỗi ô):")
+    print_puzzle_box(start24)
+    t0 = time.perf_counter()
+    path, expanded, generated = ida_star_search(start24, puzzle24, heuristic="linear_conflict")
+    print("\n▶ IDA* + Manhattan + Linear conflict:")
+    print_solution(path, expanded, generated, puzzle24, time.perf_counter() - t0, show_steps=False)
+
+    # Engine nhận trạng thái đích tùy ý
+    custom = SlidingPuzzle([[1, 2, 3], [4, 5, 6], [7, 8, 0]])
+    start_custom = custom.scramble(40, seed=7)
+    print("\n📌 ĐÍCH TÙY Ý: 1 2 3 / 4 5 6 / 7 8 _")
+    t0 = time.perf_counter()
+    path, expanded, generated = ida_star_search(start_custom, custom)
+    print_solution(path, expanded, generated, custom, time.perf_counter() - t0)
+
+    # =====================================================================
+    # THUẬT TOÁN 5: KIỂM TRA GIẢI ĐƯỢC VÀ TÌM KIẾM HAI CHIỀU
+    # =====================================================================
+    print("\n" + "=" * 80)
+    print("THUẬT TOÁN 5: KIỂM TRA GIẢI ĐƯỢC VÀ TÌM KIẾM HAI CHIỀU")
+    print("=" * 80)
+    unsolvable = [row[:] for row in start]
+    unsolvable[2][1], unsolvable[2][2] = unsolvable[2][2], unsolvable[2][1]  # đổi chỗ 2 ô → đảo tính chẵn lẻ
+    print("📌 Đổi chỗ hai ô 3 và 1 của trạng thái A:")
+    print_puzzle_box(unsolvable)
+    t0 = time.perf_counter()
+    path, expanded, generated = astar_search(unsolvable)
+    print(f"   is_solvable = {is_solvable(unsolvable)} → A* từ chối ngay: path = {path}, "
+          f"mở rộng {expanded} nút, {(time.perf_counter() - t0) * 1000:.2f} ms "
+          f"(trước đây phải duyệt hết 181,440 trạng thái)")
+
+    print("\n📖 Tìm từ start và từ đích cùng lúc: mỗi phía chỉ đi khoảng nửa độ sâu lời giải")
+    for label, board, puzzle_n in (("8-puzzle (A)", start, puzzle), ("15-puzzle", start15, puzzle15)):
+        print(f"\n▶ {label}:")
+        runs = [("A* (linear conflict)", lambda: astar_search(board, puzzle_n, heuristic="linear_conflict")),
+                ("A* hai chiều (linear conflict)", lambda: bidirectional_search(board, puzzle_n, "linear_conflict"))]
+        if puzzle_n.n == 3:
+            runs.insert(1, ("BFS hai chiều", lambda: bidirectional_search(board, puzzle_n)))
+        for name, run in runs:
+            t0 = time.perf_counter()
+            path, expanded, generated = run()
+            elapsed = time.perf_counter() - t0
+            print(f"   • {name:<31} {len(path) - 1} bước | mở rộng {expanded:>7} nút | "
+                  f"sinh {generated:>7} nút | {elapsed:6.2f}s")
+    print("\n" + "=" * 80)
 
 if __name__ == "__main__":
     main()
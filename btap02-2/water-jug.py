@@ -115,6 +115,23 @@ def get_neighbors(state: WaterJugState) -> List[TupleType[WaterJugState, str]]:
     return neighbors
 
 
+def reconstruct_path(came_from: Dict[TupleType[int, int], tuple], link: tuple,
+                     goal: WaterJugState) -> List[TupleType[WaterJugState, str]]:
+    """
+    Dựng lại đường đi một lần khi đạt đích từ bảng con trỏ cha.
+    
+    link = (trạng thái cha, hành động từ cha) của nút đích, None nếu đích là trạng thái đầu;
+    came_from[trạng thái] = link của trạng thái đó khi được mở rộng.
+    """
+    path = [(goal, "ĐẠT MỤC TIÊU!")]
+    while link is not None:
+        parent_state, action = link
+        path.append((parent_state, action))
+        link = came_from[parent_state.to_tuple()]
+    path.reverse()
+    return path
+
+
 def greedy_bfs(start: WaterJugState) -> TupleType[List[TupleType[WaterJugState, str]], int, int]:
     """
     Thuật toán Greedy Best-First Search (chuẩn sách giáo khoa)
@@ -129,19 +146,21 @@ def greedy_bfs(start: WaterJugState) -> TupleType[List[TupleType[WaterJugState,
     """
     pq = []
     visited: Set[TupleType[int, int]] = set()
+    # Con trỏ cha của các trạng thái đã mở rộng: state_tuple -> (trạng thái cha, hành động)
+    came_from: Dict[TupleType[int, int], tuple] = {}
     
     # Counter để tie-breaking khi h(n) bằng nhau
     counter = 0
     
-    # Push trạng thái ban đầu: (h, counter, state, path)
-    heapq.heappush(pq, (heuristic(start), counter, start, []))
+    # Push trạng thái ban đầu: (h, counter, state, link tới cha)
+    heapq.heappush(pq, (heuristic(start), counter, start, None))
     counter += 1
     
     nodes_expanded = 0
     nodes_generated = 1
     
     while pq:
-        h, _, current_state, path = heapq.heappop(pq)
+        h, _, current_state, link = heapq.heappop(pq)
         
         state_tuple = current_state.to_tuple()
         
@@ -151,10 +170,11 @@ def greedy_bfs(start: WaterJugState) -> TupleType[List[TupleType[WaterJugState,
         
         # Kiểm tra đạt đích TRƯỚC khi đánh dấu visited
         if current_state.is_goal():
-            return path + [(current_state, "ĐẠT MỤC TIÊU!")], nodes_expanded, nodes_generated
+            return reconstruct_path(came_from, link, current_state), nodes_expanded, nodes_generated
         
         # Đánh dấu đã thăm
         visited.add(state_tuple)
+        came_from[state_tuple] = link
         nodes_expanded += 1
         
         # Sinh các trạng thái kề
@@ -165,7 +185,7 @@ def greedy_bfs(start: WaterJugState) -> TupleType[List[TupleType[WaterJugState,
             if neighbor_tuple not in visited:
                 heapq.heappush(
                     pq,
-                    (heuristic(neighbor_state), counter, neighbor_state, path + [(current_state, action)])
+                    (heuristic(neighbor_state), counter, neighbor_state, (current_state, action))
                 )
                 counter += 1
                 nodes_generated += 1
@@ -190,6 +210,8 @@ def astar_search(start: WaterJugState) -> TupleType[List[TupleType[WaterJugState
     pq = []
     visited: Set[TupleType[int, int]] = set()
     g_scores: Dict[TupleType[int, int], int] = {}
+    # Con trỏ cha của các trạng thái đã mở rộng: state_tuple -> (trạng thái cha, hành động)
+    came_from: Dict[TupleType[int, int], tuple] = {}
     
     # Counter để tie-breaking khi f(n) bằng nhau
     counter = 0
@@ -201,8 +223,8 @@ def astar_search(start: WaterJugState) -> TupleType[List[TupleType[WaterJugState
     # Priority = f(n) = g(n) + h(n), với g ban đầu = 0
     priority = 0 + h0
     
-    # Push trạng thái ban đầu: (f, counter, g, state, path)
-    heapq.heappush(pq, (priority, counter, 0, start, []))
+    # Push trạng thái ban đầu: (f, counter, g, state, link tới cha)
+    heapq.heappush(pq, (priority, counter, 0, start, None))
     counter += 1
     g_scores[start_tuple] = 0
     
@@ -210,7 +232,7 @@ def astar_search(start: WaterJugState) -> TupleType[List[TupleType[WaterJugState
     nodes_generated = 1
     
     while pq:
-        f, _, g, current_state, path = heapq.heappop(pq)
+        f, _, g, current_state, link = heapq.heappop(pq)
         
         state_tuple = current_state.to_tuple()
         
@@ -220,10 +242,11 @@ def astar_search(start: WaterJugState) -> TupleType[List[TupleType[WaterJugState
         
         # Kiểm tra đạt đích TRƯỚC khi đánh dấu visited
         if current_state.is_goal():
-            return path + [(current_state, "ĐẠT MỤC TIÊU!")], nodes_expanded, nodes_generated
+            return reconstruct_path(came_from, link, current_state), nodes_expanded, nodes_generated
         
         # Đánh dấu đã thăm
         visited.add(state_tuple)
+        came_from[state_tuple] = link
         nodes_expanded += 1
         
         # Mở rộng các trạng thái kề
@@ -247,7 +270,7 @@ def astar_search(start: WaterJugState) -> TupleType[List[TupleType[WaterJugState
             
             heapq.heappush(
                 pq,
-                (priority, counter, new_g, neighbor_state, path + [(current_state, action)])
+                (priority, counter, new_g, neighbor_state, (current_state, action))
             )
             counter += 1
             nodes_generated += 1